@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -36,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
+    'whitenoise.runserver_nostatic',
     'django.contrib.staticfiles',
     'rest_framework',
     'core',
@@ -45,10 +47,13 @@ AUTH_USER_MODEL = 'core.User'
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ProfileMiddleware',
+    'core.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -56,7 +61,16 @@ MIDDLEWARE = [
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+    ),
+    # Token-bucket sizes per endpoint scope, see core.throttling.
+    'DEFAULT_THROTTLE_RATES': {
+        'recommend': '60/min',
+        'available_slots': '120/min',
+        'register': '10/hour',
+    },
+    # Render's proxy appends the client address to X-Forwarded-For; trust only
+    # that last entry when keying anonymous clients.
+    'NUM_PROXIES': 1,
 }
 
 ROOT_URLCONF = 'cleanbase.urls'
@@ -89,6 +103,34 @@ DATABASES = {
     }
 }
 
+# Region sharding, see core.sharding. Bookings and availability of providers
+# inside a region live in that region's database (an alias named after the
+# region); everything else stays in 'default' and is mirrored to every shard.
+# Regions are (min_lat, min_lng, max_lat, max_lng) boxes. Only append to this
+# list: a region's position fixes its id block.
+REGIONS = {
+    'lagos': (6.35, 2.70, 6.75, 4.00),
+    'abuja': (8.80, 7.10, 9.30, 7.70),
+}
+# CLEANBASE_SHARDING=1 turns sharding on with one SQLite file per region; run
+# `manage.py sync_shards` after enabling it or adding a region.
+if os.environ.get('CLEANBASE_SHARDING') == '1':
+    DATABASES.update({
+        region: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / f'db_{region}.sqlite3'}
+        for region in REGIONS
+    })
+    DATABASE_ROUTERS = ['core.sharding.RegionRouter']
+
+# One cache for all gunicorn workers, so token buckets (core.throttling) and
+# template fragments are shared instead of per process. It lives in 'default';
+# create the table with `manage.py createcachetable` (tests do it themselves).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cleanbase_cache',
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -125,10 +167,62 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# collectstatic writes content-hashed copies of every file plus .gz and .br
+# variants; WhiteNoise serves the hashed names with a far-future immutable
+# Cache-Control header and hands file objects to the server's
+# wsgi.file_wrapper, which gunicorn sends with sendfile().
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-PAYSTACK_SECRET_KEY = 'sk_test_xxx'
\ No newline at end of file
+PAYSTACK_SECRET_KEY = 'sk_test_xxx'
+PAYSTACK_BASE_URL = 'https://api.paystack.co'
+
+# Unpaid pending bookings are expired (and their slot freed) after this long.
+BOOKING_PENDING_TTL_MINUTES = 30
+
+# In-process memoization of recommend_providers, see core.recommendations.
+RECOMMENDATION_CACHE = {
+    'CELL_DEGREES': 0.005,  # ~550 m grid cells
+    'TTL': 60,
+    'MAX_ENTRIES': 1024,
+}
+
+# Opt-in request profiling, see core.profiling. Staff can list and download
+# captures at /profiling/.
+PROFILING = {
+    'ENABLED': False,
+    'DIR': BASE_DIR / 'profiles',
+    'TOKEN': None,  # value of the X-Profile header that triggers a capture
+    'SLOW_REQUEST_MS': 1000,  # None disables automatic capture
+    'SAMPLE_INTERVAL': 0.005,
+    'MAX_PROFILES': 200,
+}
+
+# Retention horizons for core.archive (archive_data command), in days.
+DATA_RETENTION = {
+    'BOOKING_DAYS': 180,  # finished bookings scheduled before this move to ArchivedBooking
+    'AVAILABILITY_DAYS': 7,  # availability slots dated before this move to ArchivedAvailability
+    'TASK_DAYS': 7,  # finished background tasks older than this are deleted
+    'CHUNK_SIZE': 1000,
+}
+
+# Precomputed supply/demand heatmap, see core.heatmap.
+HEATMAP = {
+    'PRECISIONS': (4, 5, 6),  # geohash lengths stored: ~39 km, ~4.9 km, ~1.2 km cells
+    'DEFAULT_PRECISION': 5,
+    'MAX_CELLS': 5000,  # per response; larger viewports must use a coarser precision
+    'REFRESH_DELAY': 30,  # seconds; batches changes before a cell rebuild
+}
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (
     User, Customer, ServiceProvider, ServiceCategory,
-    Service, Booking
+    Service, Booking, Task, ArchivedBooking, ArchivedAvailability
 )
 
 admin.site.register(User)
@@ -9,4 +9,7 @@ admin.site.register(Customer)
 admin.site.register(ServiceProvider)
 admin.site.register(ServiceCategory)
 admin.site.register(Service)
-admin.site.register(Booking)
\ No newline at end of file
+admin.site.register(Booking)
+admin.site.register(Task)
+admin.site.register(ArchivedBooking)
+admin.site.register(ArchivedAvailability)
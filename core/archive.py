@@ -0,0 +1,91 @@
+"""
+Data retention for bookings and availability.
+
+:func:`archive_bookings` moves finished bookings scheduled more than
+``DATA_RETENTION['BOOKING_DAYS']`` days ago into ArchivedBooking, and
+:func:`archive_availability` moves availability slots older than
+``AVAILABILITY_DAYS`` into ArchivedAvailability. Rows move in chunks, each
+copied and deleted in its own transaction, so the live tables (and the indexes
+behind available_slots, recommendations and the bookings API) only hold current
+data. Archived rows are read only when a caller asks for them, see
+:func:`wants_archived`. With region sharding each shard is archived in place.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .lifecycle import CANCELLED, COMPLETED, EXPIRED
+from .models import ArchivedAvailability, ArchivedBooking, Availability, Booking
+from .sharding import delete_rows, shard_aliases
+
+DEFAULTS = {
+    'BOOKING_DAYS': 180,
+    'AVAILABILITY_DAYS': 7,
+    'TASK_DAYS': 7,
+    'CHUNK_SIZE': 1000,
+}
+
+# Bookings in these states never change again and can leave the live table.
+ARCHIVABLE_STATUSES = (COMPLETED, CANCELLED, EXPIRED)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'DATA_RETENTION', {})}
+
+
+def wants_archived(request):
+    """True if the request opted into archived rows with ``?include_archived=1``."""
+    return request.GET.get('include_archived', '').lower() in ('1', 'true', 'yes')
+
+
+def move_rows(queryset, archive_model, chunk_size):
+    """
+    Copy the rows of ``queryset`` into ``archive_model`` (in the same database)
+    and delete them from the live table, ``chunk_size`` rows per transaction.
+    Returns the number moved.
+    """
+    model = queryset.model
+    db = queryset.db
+    columns = [field.attname for field in model._meta.concrete_fields]
+    archived_at = timezone.now()
+    moved = 0
+    while True:
+        with transaction.atomic(using=db):
+            rows = list(queryset.order_by('pk').values(*columns)[:chunk_size])
+            if not rows:
+                return moved
+            archive_model.objects.using(db).bulk_create(archive_model(archived_at=archived_at, **row) for row in rows)
+            # Skip the per-row post_delete signals; archived rows are in the
+            # past, so no listing or recommendation depends on them.
+            delete_rows(model, db, [row['id'] for row in rows])
+            moved += len(rows)
+
+
+def archivable_bookings(days):
+    cutoff = timezone.localdate() - timedelta(days=days)
+    return Booking.objects.filter(status__in=ARCHIVABLE_STATUSES, scheduled_date__lt=cutoff)
+
+
+def archivable_availability(days):
+    cutoff = timezone.localdate() - timedelta(days=days)
+    return Availability.objects.filter(date__lt=cutoff)
+
+
+def archive_bookings(days=None, chunk_size=None):
+    config = get_config()
+    queryset = archivable_bookings(config['BOOKING_DAYS'] if days is None else days)
+    return sum(
+        move_rows(queryset.using(alias), ArchivedBooking, chunk_size or config['CHUNK_SIZE'])
+        for alias in shard_aliases()
+    )
+
+
+def archive_availability(days=None, chunk_size=None):
+    config = get_config()
+    queryset = archivable_availability(config['AVAILABILITY_DAYS'] if days is None else days)
+    return sum(
+        move_rows(queryset.using(alias), ArchivedAvailability, chunk_size or config['CHUNK_SIZE'])
+        for alias in shard_aliases()
+    )
@@ -0,0 +1,75 @@
+"""
+Helpers shared by the ``bench_*`` management commands.
+
+Benchmarks run against a throwaway test database so they never touch the
+real ``db.sqlite3``.
+"""
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+@contextmanager
+def scratch_database():
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def measure(func, repeat=5, number=1):
+    """Return per-call timings in seconds for ``repeat`` runs of ``number`` calls."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return timings
+
+
+def summarize(label, timings):
+    return (
+        f"{label}: min {min(timings) * 1000:.2f} ms, "
+        f"median {statistics.median(timings) * 1000:.2f} ms "
+        f"({len(timings)} runs)"
+    )
+
+
+def seed_catalog(services, providers=None):
+    """Bulk-insert ``services`` services spread over ``providers`` providers."""
+    from .models import Service, ServiceCategory, ServiceProvider, User
+
+    providers = providers or max(1, services // 10)
+    users = User.objects.bulk_create(
+        User(username=f"bench-provider-{i}", is_service_provider=True) for i in range(providers)
+    )
+    provider_objs = ServiceProvider.objects.bulk_create(
+        ServiceProvider(
+            user=u, phone="", address="", rating=(i % 50) / 10,
+            latitude=6.4 + (i % 100) / 1000, longitude=3.3 + (i % 97) / 1000,
+        )
+        for i, u in enumerate(users)
+    )
+    categories = ServiceCategory.objects.bulk_create(
+        ServiceCategory(name=name) for name in ("Cleaning", "Moving", "Laundry", "Gardening")
+    )
+    Service.objects.bulk_create(
+        (
+            Service(
+                provider=provider_objs[i % providers], category=categories[i % len(categories)],
+                title=f"Service {i}", description="Benchmark service", price=1000 + i % 500,
+                duration_minutes=60,
+            )
+            for i in range(services)
+        ),
+        batch_size=1000,
+    )
+    return provider_objs, categories
@@ -0,0 +1,203 @@
+"""
+Fast read path for list endpoints.
+
+DRF's ``ModelSerializer`` builds every row by walking its fields and calling
+``to_representation`` on each, and a nested serializer also makes the view
+load related objects one by one. :func:`compile_serializer` inspects a
+serializer class once and generates a plain function that turns one
+``values()`` row (with related fields fetched through JOINs) into the same
+dict the serializer would produce. :class:`FastListMixin` uses it for
+``list()``, and :class:`FastJSONRenderer` encodes the rows with ``orjson``
+when it is installed.
+
+The output is byte-for-byte what ``JSONRenderer`` produces for the regular
+serializer; ``core.tests`` checks this. Serializers the compiler cannot
+translate (method fields, ``source='*'``, dotted sources, ``many=True``) fall
+back to the regular DRF path.
+"""
+import json
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import fields, relations, serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import ISO_8601, api_settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+else:
+    if not hasattr(orjson, 'Fragment'):
+        orjson = None
+
+
+class UnsupportedField(Exception):
+    pass
+
+
+class FastRows(list):
+    """Rows produced by a compiled converter; they contain only JSON primitives."""
+
+
+class ReprFloat(float):
+    # orjson and json.dumps format very small and very large floats
+    # differently; these are routed through float.__repr__ like json does.
+    pass
+
+
+def as_float(value):
+    value = float(value)
+    if value and not 1e-4 <= abs(value) < 1e16:
+        return ReprFloat(value)
+    return value
+
+
+def datetime_converter(field, tz_var):
+    if getattr(field, 'format', api_settings.DATETIME_FORMAT) != ISO_8601 or hasattr(field, 'timezone'):
+        raise UnsupportedField(field)
+
+    def convert(value, tz):
+        if not value:
+            return None
+        if tz is not None:
+            value = value.astimezone(tz) if timezone.is_aware(value) else timezone.make_aware(value, tz)
+        elif timezone.is_aware(value):
+            value = timezone.make_naive(value, dt_timezone.utc)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert, f', {tz_var}'
+
+
+def isoformat_converter(field, setting):
+    if getattr(field, 'format', setting) != ISO_8601:
+        raise UnsupportedField(field)
+    return (lambda value: value.isoformat() if value else None), ''
+
+
+def decimal_converter(field):
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.normalize_output:
+        return field.to_representation, ''
+    quantize = field.quantize
+    return (lambda value: '{:f}'.format(quantize(value))), ''
+
+
+# Fields whose to_representation leaves a values() result unchanged.
+IDENTITY_FIELDS = (
+    fields.BooleanField, fields.IntegerField, fields.CharField, fields.EmailField,
+)
+
+
+def field_converter(field, tz_var):
+    """
+    Return ``(func, extra_args)`` for a field, or None if the value from
+    ``values()`` is already what the field would output.
+    """
+    field_type = type(field)
+    if field_type in IDENTITY_FIELDS:
+        return None
+    if field_type is relations.PrimaryKeyRelatedField and field.pk_field is None:
+        return None
+    if field_type is fields.ChoiceField:
+        mapping = field.choice_strings_to_values
+        return (lambda value: mapping.get(str(value), value) if value != '' else value), ''
+    if field_type is fields.FloatField:
+        return as_float, ''
+    if field_type is fields.DecimalField:
+        return decimal_converter(field)
+    if field_type is fields.DateTimeField:
+        return datetime_converter(field, tz_var)
+    if field_type is fields.DateField:
+        return isoformat_converter(field, api_settings.DATE_FORMAT)
+    if field_type is fields.TimeField:
+        return isoformat_converter(field, api_settings.TIME_FORMAT)
+    raise UnsupportedField(field)
+
+
+class CompiledSerializer:
+    def __init__(self, serializer_class):
+        self.paths = []
+        self.namespace = {}
+        body = self.build(serializer_class(), '')
+        source = f"def make(tz):\n    def convert(row):\n        return {body}\n    return convert\n"
+        exec(compile(source, f'<compiled {serializer_class.__name__}>', 'exec'), self.namespace)
+        self.make = self.namespace['make']
+
+    def build(self, serializer, prefix):
+        items = []
+        for field in serializer._readable_fields:
+            source = field.source
+            if source == '*' or '.' in source:
+                raise UnsupportedField(field)
+            path = prefix + source
+            self.paths.append(path)
+            key = repr(field.field_name)
+            if isinstance(field, (serializers.ListSerializer, relations.ManyRelatedField)):
+                raise UnsupportedField(field)
+            if isinstance(field, serializers.BaseSerializer):
+                nested = self.build(field, path + '__')
+                items.append(f"{key}: ({nested} if row[{path!r}] is not None else None)")
+                continue
+            converter = field_converter(field, 'tz')
+            if converter is None:
+                items.append(f"{key}: row[{path!r}]")
+                continue
+            func, extra = converter
+            name = f"_f{len(self.namespace)}"
+            self.namespace[name] = func
+            items.append(f"{key}: ({name}(v{extra}) if (v := row[{path!r}]) is not None else None)")
+        return '{' + ', '.join(items) + '}'
+
+    def convert_queryset(self, queryset):
+        convert = self.make(timezone.get_current_timezone() if settings.USE_TZ else None)
+        return FastRows(convert(row) for row in queryset.values(*dict.fromkeys(self.paths)))
+
+
+_compiled = {}
+
+
+def compile_serializer(serializer_class):
+    """Return the CompiledSerializer for ``serializer_class``, or None if it can't be compiled."""
+    if serializer_class not in _compiled:
+        try:
+            _compiled[serializer_class] = CompiledSerializer(serializer_class)
+        except UnsupportedField:
+            _compiled[serializer_class] = None
+    return _compiled[serializer_class]
+
+
+def _orjson_default(value):
+    if isinstance(value, ReprFloat):
+        return orjson.Fragment(json.dumps(float(value), allow_nan=False))
+    raise TypeError
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that encodes FastRows with orjson, producing identical bytes."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is not None and isinstance(data, FastRows) and self.compact and not self.ensure_ascii \
+                and self.get_indent(accepted_media_type, renderer_context or {}) is None:
+            try:
+                ret = orjson.dumps(data, default=_orjson_default)
+            except (orjson.JSONEncodeError, TypeError, ValueError):
+                pass
+            else:
+                return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class FastListMixin:
+    """Serve ``list()`` from ``values()`` rows through the compiled serializer."""
+
+    def list(self, request, *args, **kwargs):
+        compiled = compile_serializer(self.get_serializer_class())
+        if compiled is None or self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(compiled.convert_queryset(queryset))
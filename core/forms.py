@@ -1,4 +1,5 @@
 from django import forms
+from .lifecycle import PENDING
 from .models import Customer, ServiceProvider, Booking, Availability
 
 
@@ -21,10 +22,15 @@ class BookingForm(forms.ModelForm):
     class Meta:
         model = Booking
         fields = [
-            'customer', 'service', 'scheduled_time', 'status',
-            'address', 'is_paid', 'payment_reference'
+            'customer', 'service', 'scheduled_time', 'status', 'address',
         ]
 
+    def clean_status(self):
+        status = self.cleaned_data['status']
+        if self.instance._state.adding and status != PENDING:
+            raise forms.ValidationError(f"New bookings start as {PENDING}.")
+        return status
+
 
 class AvailabilityForm(forms.ModelForm):
     class Meta:
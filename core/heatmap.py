@@ -0,0 +1,185 @@
+"""
+Precomputed supply/demand heatmap.
+
+HeatmapCell holds per category, date and geohash cell the number of providers
+offering the category, their open (unbooked) availability slots and the active
+bookings for it. Cells are stored at every precision in
+``HEATMAP['PRECISIONS']`` so a zoomed-out map can ask for a coarser grid.
+
+:func:`refresh_heatmap` rebuilds the cells of one (category, date) from the
+live tables. Booking and availability changes schedule it through the task
+queue (see core.tasks); ``manage.py refresh_heatmap`` rebuilds a date range and
+picks up changes the signals don't track, like a provider moving.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .lifecycle import RELEASED_STATUSES
+from .models import Availability, Booking, HeatmapCell, ServiceListing
+from .sharding import gather
+
+DEFAULTS = {
+    'PRECISIONS': (4, 5, 6),
+    'DEFAULT_PRECISION': 5,
+    'MAX_CELLS': 5000,
+    'REFRESH_DELAY': 30,
+}
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+FIELDS = ['geohash', 'latitude', 'longitude', 'providers', 'open_slots', 'bookings']
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'HEATMAP', {})}
+
+
+# ---------------------------
+# Geohash
+# ---------------------------
+def encode(latitude, longitude, precision):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bit, value, even = 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        mid = (interval[0] + interval[1]) / 2
+        if coordinate >= mid:
+            value = value * 2 + 1
+            interval[0] = mid
+        else:
+            value *= 2
+            interval[1] = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(BASE32[value])
+            bit, value = 0, 0
+    return ''.join(chars)
+
+
+def decode(geohash):
+    """Return the (latitude, longitude) centre of a geohash cell."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = BASE32.index(char)
+        for shift in range(4, -1, -1):
+            interval = lng_range if even else lat_range
+            mid = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = mid
+            else:
+                interval[1] = mid
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lng_range[0] + lng_range[1]) / 2
+
+
+def cell_size(precision):
+    """Return the (height, width) of a cell in degrees."""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+# ---------------------------
+# Aggregation
+# ---------------------------
+def provider_counts(category_id, date):
+    """Return {provider_id: (latitude, longitude, offers, open_slots, bookings)} for one category and date."""
+    locations, offering = {}, set()
+    listings = ServiceListing.objects.filter(
+        category_id=category_id, latitude__isnull=False, longitude__isnull=False,
+    ).values_list('provider_id', 'latitude', 'longitude', 'is_available')
+    for provider_id, latitude, longitude, is_available in listings:
+        locations[provider_id] = (latitude, longitude)
+        if is_available:
+            offering.add(provider_id)
+
+    # Any active booking occupies the provider's slot, whatever its category.
+    booked_times = defaultdict(list)
+    demand = defaultdict(int)
+    bookings = gather(
+        Booking.objects
+        .filter(provider_id__in=locations, scheduled_date=date)
+        .exclude(status__in=RELEASED_STATUSES)
+        .values_list('provider_id', 'scheduled_time', 'service__category_id'),
+        key=None,
+    )
+    for provider_id, scheduled_time, booking_category_id in bookings:
+        if timezone.is_aware(scheduled_time):
+            scheduled_time = timezone.localtime(scheduled_time)
+        booked_times[provider_id].append(scheduled_time.time())
+        if booking_category_id == category_id:
+            demand[provider_id] += 1
+
+    open_slots = defaultdict(int)
+    slots = gather(
+        Availability.objects.filter(provider_id__in=offering, date=date)
+        .values_list('provider_id', 'start_time', 'end_time'),
+        key=None,
+    )
+    for provider_id, start_time, end_time in slots:
+        if not any(start_time <= time < end_time for time in booked_times[provider_id]):
+            open_slots[provider_id] += 1
+
+    return {
+        provider_id: (*location, provider_id in offering, open_slots[provider_id], demand[provider_id])
+        for provider_id, location in locations.items()
+        if provider_id in offering or demand[provider_id]
+    }
+
+
+def build_cells(category_id, date, precisions):
+    totals = defaultdict(lambda: [0, 0, 0])
+    max_precision = max(precisions)
+    for latitude, longitude, offers, open_slots, bookings in provider_counts(category_id, date).values():
+        geohash = encode(latitude, longitude, max_precision)
+        for precision in precisions:
+            cell = totals[geohash[:precision]]
+            cell[0] += offers
+            cell[1] += open_slots
+            cell[2] += bookings
+    cells = []
+    for geohash, (providers, open_slots, bookings) in totals.items():
+        latitude, longitude = decode(geohash)
+        cells.append(HeatmapCell(
+            category_id=category_id, date=date, geohash=geohash, precision=len(geohash),
+            latitude=latitude, longitude=longitude,
+            providers=providers, open_slots=open_slots, bookings=bookings,
+        ))
+    return cells
+
+
+def refresh_heatmap(category_id, date):
+    """Recompute every cell of ``category_id`` on ``date``. Returns the number of cells."""
+    cells = build_cells(category_id, date, get_config()['PRECISIONS'])
+    with transaction.atomic():
+        HeatmapCell.objects.filter(category_id=category_id, date=date).delete()
+        HeatmapCell.objects.bulk_create(cells)
+    return len(cells)
+
+
+# ---------------------------
+# Queries
+# ---------------------------
+def cells_in_bbox(category_id, date, precision, bbox):
+    """
+    Return the cells overlapping ``bbox`` (min_lng, min_lat, max_lng, max_lat)
+    as lists in ``FIELDS`` order, or None if there are more than MAX_CELLS.
+    """
+    min_lng, min_lat, max_lng, max_lat = bbox
+    height, width = cell_size(precision)
+    # Cells are stored by their centre, so widen the box by half a cell.
+    queryset = HeatmapCell.objects.filter(
+        category_id=category_id, date=date, precision=precision,
+        latitude__range=(min_lat - height / 2, max_lat + height / 2),
+        longitude__range=(min_lng - width / 2, max_lng + width / 2),
+    ).order_by('geohash')
+    limit = get_config()['MAX_CELLS']
+    rows = [list(row) for row in queryset.values_list(*FIELDS)[:limit + 1]]
+    if len(rows) > limit:
+        return None
+    return rows
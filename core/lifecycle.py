@@ -0,0 +1,77 @@
+"""
+Booking status state machine.
+
+All status changes should go through :func:`transition` (one booking) or
+:func:`bulk_transition` (a queryset), which reject moves the lifecycle does
+not allow, e.g. reopening a cancelled booking.
+"""
+from django.db import transaction
+
+from .models import Booking
+
+PENDING = 'pending'
+CONFIRMED = 'confirmed'
+COMPLETED = 'completed'
+CANCELLED = 'cancelled'
+EXPIRED = 'expired'
+
+TRANSITIONS = {
+    PENDING: {CONFIRMED, CANCELLED, EXPIRED},
+    CONFIRMED: {COMPLETED, CANCELLED},
+    COMPLETED: set(),
+    CANCELLED: set(),
+    EXPIRED: set(),
+}
+
+# Bookings in these states no longer hold their time slot.
+RELEASED_STATUSES = (CANCELLED, EXPIRED)
+
+# The only status a customer may move their own booking to. Confirmation
+# comes from the payment path (mark_booking_paid) or the provider.
+CUSTOMER_STATUSES = (CANCELLED,)
+
+
+class InvalidTransition(ValueError):
+    pass
+
+
+def can_transition(current, target):
+    return target in TRANSITIONS.get(current, ())
+
+
+def sources_for(target):
+    return [status for status, targets in TRANSITIONS.items() if target in targets]
+
+
+def transition(booking, target, save=True):
+    if not can_transition(booking.status, target):
+        raise InvalidTransition(f"Cannot move booking {booking.pk} from {booking.status} to {target}.")
+    booking.status = target
+    if save:
+        booking.save(update_fields=['status'])
+    return booking
+
+
+def bulk_transition(queryset, target, chunk_size=1000):
+    """
+    Move every booking in ``queryset`` that may legally reach ``target``.
+
+    Rows are updated with set-based UPDATEs of at most ``chunk_size`` rows,
+    each in its own transaction on the queryset's database, so long runs
+    don't hold the write lock.
+    Bookings in a state that cannot reach ``target`` are left untouched.
+    Returns the number of bookings moved.
+    """
+    if target not in TRANSITIONS:
+        raise InvalidTransition(f"Unknown booking status {target}.")
+    candidates = queryset.filter(status__in=sources_for(target))
+    db = queryset.db
+    moved = 0
+    while True:
+        with transaction.atomic(using=db):
+            pks = list(candidates.values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                return moved
+            moved += Booking.objects.using(db).filter(
+                pk__in=pks, status__in=sources_for(target)
+            ).update(status=target)
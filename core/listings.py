@@ -0,0 +1,100 @@
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import Availability, Service, ServiceListing
+from .sharding import gather
+
+LISTING_FIELDS = [
+    'title', 'price', 'duration_minutes', 'is_available',
+    'provider', 'provider_name', 'provider_rating', 'latitude', 'longitude',
+    'category', 'category_name', 'next_available_date', 'updated_at',
+]
+
+
+def next_available_dates(provider_ids=None):
+    qs = Availability.objects.filter(date__gte=timezone.localdate())
+    if provider_ids is not None:
+        qs = qs.filter(provider_id__in=provider_ids)
+    return dict(gather(qs.values('provider_id').annotate(next_date=Min('date')).values_list('provider_id', 'next_date'), key=None))
+
+
+def build_listing(service, next_dates):
+    provider = service.provider
+    return ServiceListing(
+        service_id=service.id,
+        title=service.title,
+        price=service.price,
+        duration_minutes=service.duration_minutes,
+        is_available=service.is_available,
+        provider_id=provider.id,
+        provider_name=provider.user.username,
+        provider_rating=provider.rating,
+        latitude=provider.latitude,
+        longitude=provider.longitude,
+        category_id=service.category_id,
+        category_name=service.category.name,
+        next_available_date=next_dates.get(provider.id),
+        updated_at=timezone.now(),
+    )
+
+
+def refresh_listings(services):
+    """Upsert the listing rows for ``services`` (a Service queryset)."""
+    services = list(services.select_related('provider__user', 'category'))
+    if not services:
+        return 0
+    next_dates = next_available_dates({s.provider_id for s in services})
+    ServiceListing.objects.bulk_create(
+        [build_listing(s, next_dates) for s in services],
+        update_conflicts=True,
+        unique_fields=['service'],
+        update_fields=LISTING_FIELDS,
+    )
+    return len(services)
+
+
+def refresh_provider_dates(provider_id):
+    next_date = next_available_dates([provider_id]).get(provider_id)
+    ServiceListing.objects.filter(provider_id=provider_id).update(
+        next_available_date=next_date, updated_at=timezone.now()
+    )
+
+
+def refresh_stale_dates():
+    """
+    Recompute next_available_date for every provider whose listings point to a
+    day that has passed. Returns the number of listings updated.
+    """
+    stale = ServiceListing.objects.filter(next_available_date__lt=timezone.localdate())
+    provider_ids = set(stale.values_list('provider_id', flat=True))
+    if not provider_ids:
+        return 0
+    next_dates = next_available_dates(provider_ids)
+    now = timezone.now()
+    return sum(
+        ServiceListing.objects.filter(provider_id=provider_id).update(
+            next_available_date=next_dates.get(provider_id), updated_at=now
+        )
+        for provider_id in provider_ids
+    )
+
+
+def rebuild_listings(batch_size=1000):
+    """Recreate the whole read model from the source tables."""
+    next_dates = next_available_dates()
+    services = Service.objects.select_related('provider__user', 'category').order_by('id')
+    total = 0
+    with transaction.atomic():
+        ServiceListing.objects.all().delete()
+        batch = []
+        for service in services.iterator(chunk_size=batch_size):
+            batch.append(build_listing(service, next_dates))
+            if len(batch) >= batch_size:
+                ServiceListing.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            ServiceListing.objects.bulk_create(batch)
+            total += len(batch)
+    return total
@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.archive import (
+    archivable_availability, archivable_bookings, archive_availability,
+    archive_bookings, get_config,
+)
+from core.sharding import shard_aliases
+from core.taskqueue import purge_done, purgeable
+
+
+class Command(BaseCommand):
+    help = (
+        "Move finished bookings and past availability older than the retention "
+        "horizon (settings.DATA_RETENTION) into the archive tables and delete old "
+        "finished background tasks. Meant to run periodically."
+    )
+
+    def add_arguments(self, parser):
+        config = get_config()
+        parser.add_argument('--booking-days', type=int, default=config['BOOKING_DAYS'])
+        parser.add_argument('--availability-days', type=int, default=config['AVAILABILITY_DAYS'])
+        parser.add_argument('--task-days', type=int, default=config['TASK_DAYS'])
+        parser.add_argument('--chunk-size', type=int, default=config['CHUNK_SIZE'])
+        parser.add_argument('--dry-run', action='store_true', help="Only count the rows that would move.")
+
+    def handle(self, *args, **options):
+        task_horizon = timezone.now() - timedelta(days=options['task_days'])
+        if options['dry_run']:
+            bookings = sum(
+                archivable_bookings(options['booking_days']).using(alias).count() for alias in shard_aliases()
+            )
+            availability = sum(
+                archivable_availability(options['availability_days']).using(alias).count()
+                for alias in shard_aliases()
+            )
+            tasks = purgeable(task_horizon).count()
+            self.stdout.write(
+                f"Would archive {bookings} bookings and {availability} availability slots "
+                f"and delete {tasks} finished tasks."
+            )
+            return
+
+        bookings = archive_bookings(options['booking_days'], options['chunk_size'])
+        availability = archive_availability(options['availability_days'], options['chunk_size'])
+        tasks = purge_done(task_horizon, options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {bookings} bookings and {availability} availability slots "
+            f"and deleted {tasks} finished tasks."
+        ))
@@ -0,0 +1,69 @@
+import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+from core.benchmarks import measure, scratch_database, seed_catalog, summarize
+from core.models import Booking, Customer, Service, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the provider calendar aggregate on a scratch database, "
+        "comparing the denormalized (provider, scheduled_date) index with the "
+        "old join through Service and scheduled_time__date."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=1_000_000)
+        parser.add_argument('--providers', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.seed(options['bookings'], options['providers'])
+            provider_id = Service.objects.values_list('provider_id', flat=True).first()
+            start = datetime(2026, 3, 2).date()
+            end = start + timedelta(days=6)
+
+            def joined():
+                list(
+                    Booking.objects
+                    .filter(service__provider_id=provider_id, scheduled_time__date__range=(start, end))
+                    .annotate(period=TruncDate('scheduled_time'))
+                    .values('period').annotate(total=Count('id')).order_by('period')
+                )
+
+            def denormalized():
+                list(
+                    Booking.objects
+                    .filter(provider_id=provider_id, scheduled_date__range=(start, end))
+                    .values('scheduled_date').annotate(total=Count('id')).order_by('scheduled_date')
+                )
+
+            repeat = options['repeat']
+            self.stdout.write(f"{options['bookings']} bookings, {options['providers']} providers")
+            self.stdout.write(summarize("join + __date", measure(joined, repeat)))
+            self.stdout.write(summarize("provider_id + scheduled_date", measure(denormalized, repeat)))
+
+    def seed(self, bookings, providers):
+        seed_catalog(providers * 2, providers)
+        user = User.objects.create(username="bench-customer", is_customer=True)
+        customer = Customer.objects.create(user=user, phone="", name="Bench", email="bench@example.com")
+        services = list(Service.objects.values_list('id', 'provider_id'))
+        origin = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+        rng = random.Random(0)
+        batch = []
+        for i in range(bookings):
+            service_id, provider_id = services[rng.randrange(len(services))]
+            scheduled_time = origin + timedelta(days=rng.randrange(365), hours=rng.randrange(8, 18))
+            batch.append(Booking(
+                customer=customer, service_id=service_id, provider_id=provider_id,
+                scheduled_time=scheduled_time, scheduled_date=scheduled_time.date(), address="",
+            ))
+            if len(batch) == 10_000:
+                Booking.objects.bulk_create(batch)
+                batch = []
+        Booking.objects.bulk_create(batch)
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from core import fastrender
+from core.benchmarks import measure, scratch_database, seed_catalog, summarize
+from core.fastrender import FastJSONRenderer, compile_serializer
+from core.models import Booking, Customer, Service, User
+from core.serializers import BookingSerializer, ServiceSerializer
+
+
+class Command(BaseCommand):
+    help = "Benchmark DRF serializers + JSONRenderer against the compiled fast path on 10k-row pages."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with scratch_database():
+            seed_catalog(rows)
+            user = User.objects.create(username="bench-customer", is_customer=True)
+            customer = Customer.objects.create(user=user, phone="", name="Bench", email="bench@example.com")
+            origin = datetime(2026, 1, 1, 9, tzinfo=dt_timezone.utc)
+            Booking.objects.bulk_create(
+                (
+                    Booking(customer=customer, service=service, provider_id=service.provider_id,
+                            scheduled_time=origin + timedelta(hours=i), scheduled_date=origin.date(), address="")
+                    for i, service in enumerate(Service.objects.all())
+                ),
+                batch_size=1000,
+            )
+
+            cases = [
+                ('services', ServiceSerializer, Service.objects.order_by('pk'), ('provider__user', 'category')),
+                ('bookings', BookingSerializer, Booking.objects.order_by('pk'),
+                 ('customer__user', 'service__provider__user', 'service__category')),
+            ]
+            for label, serializer_class, queryset, related in cases:
+                compiled = compile_serializer(serializer_class)
+
+                def drf():
+                    JSONRenderer().render(serializer_class(queryset.select_related(*related), many=True).data)
+
+                def fast():
+                    FastJSONRenderer().render(compiled.convert_queryset(queryset))
+
+                def fast_stdlib_json():
+                    with mock.patch.object(fastrender, 'orjson', None):
+                        fast()
+
+                self.stdout.write(f"{label}: {rows} rows")
+                self.stdout.write(summarize("  DRF serializer (select_related)", measure(drf, options['repeat'])))
+                self.stdout.write(summarize("  compiled + json", measure(fast_stdlib_json, options['repeat'])))
+                if fastrender.orjson is not None:
+                    self.stdout.write(summarize("  compiled + orjson", measure(fast, options['repeat'])))
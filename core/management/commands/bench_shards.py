@@ -0,0 +1,155 @@
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+# Each configuration runs in its own processes, configured by a generated
+# settings module, so the real databases are never touched and writers run in
+# parallel.
+SETTINGS_TEMPLATE = """
+from cleanbase.settings import *
+
+DATABASES = {databases!r}
+REGIONS = {regions!r}
+DATABASE_ROUTERS = ['core.sharding.RegionRouter']
+"""
+
+CHILD_SCRIPT = """
+import sys
+import django
+django.setup()
+from core.management.commands import bench_shards
+bench_shards.child_main(sys.argv[1:])
+"""
+
+
+def setup_databases(providers, customers):
+    from core.models import Customer, Service, ServiceCategory, ServiceProvider, User
+    from core.sharding import region_for, shard_aliases
+
+    for alias in shard_aliases():
+        call_command('migrate', database=alias, verbosity=0)
+    boxes = list(settings.REGIONS.values()) or [(6.35, 2.70, 6.75, 4.00)]
+    users = User.objects.bulk_create(
+        User(username=f'bench-provider-{i}', is_service_provider=True) for i in range(providers)
+    )
+    provider_objs = []
+    for i, user in enumerate(users):
+        min_lat, min_lng, max_lat, max_lng = boxes[i % len(boxes)]
+        latitude, longitude = (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+        provider_objs.append(ServiceProvider(
+            user=user, phone='', address='', latitude=latitude, longitude=longitude,
+            region=region_for(latitude, longitude),
+        ))
+    provider_objs = ServiceProvider.objects.bulk_create(provider_objs)
+    category = ServiceCategory.objects.create(name='Cleaning')
+    Service.objects.bulk_create(
+        Service(provider=provider, category=category, title='Bench', description='', price=1000, duration_minutes=60)
+        for provider in provider_objs
+    )
+    customer_users = User.objects.bulk_create(
+        User(username=f'bench-customer-{i}', is_customer=True) for i in range(customers)
+    )
+    Customer.objects.bulk_create(
+        Customer(user=user, phone='', name=user.username, email=f'{user.username}@example.com')
+        for user in customer_users
+    )
+    call_command('sync_shards', skip_migrate=True, stdout=io.StringIO())
+
+
+def write_bookings(count, seed):
+    """Insert ``count`` bookings one transaction at a time, as the booking API does."""
+    from django.utils import timezone
+
+    from core.models import Booking, Customer, Service
+
+    rng = random.Random(seed)
+    services = list(Service.objects.values_list('pk', flat=True))
+    customers = list(Customer.objects.values_list('pk', flat=True))
+    base = timezone.now() + timedelta(days=1)
+    start = time.time()
+    for i in range(count):
+        Booking.objects.create(
+            customer_id=rng.choice(customers), service_id=rng.choice(services),
+            scheduled_time=base + timedelta(minutes=seed * count + i), address='bench',
+        )
+    return {'start': start, 'end': time.time()}
+
+
+def child_main(argv):
+    if argv[0] == 'setup':
+        setup_databases(int(argv[1]), int(argv[2]))
+    else:
+        print(json.dumps(write_bookings(int(argv[1]), int(argv[2]))))
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure booking write throughput with every booking in one SQLite "
+        "database versus spread over region shards (see core.sharding), using "
+        "concurrent writer processes against scratch database files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shards', type=int, default=4, help="Region databases in the sharded run.")
+        parser.add_argument('--writers', type=int, default=8, help="Concurrent writer processes.")
+        parser.add_argument('--bookings', type=int, default=250, help="Bookings inserted per writer.")
+        parser.add_argument('--providers', type=int, default=200)
+        parser.add_argument('--customers', type=int, default=100)
+
+    def run_child(self, directory, args, **kwargs):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'bench_shard_settings'}
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(directory), str(settings.BASE_DIR), env.get('PYTHONPATH')]))
+        env.pop('CLEANBASE_SHARDING', None)
+        return subprocess.Popen(
+            [sys.executable, '-c', CHILD_SCRIPT, *map(str, args)],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, **kwargs,
+        )
+
+    def wait(self, process):
+        stdout, stderr = process.communicate()
+        if process.returncode:
+            raise CommandError(f"Benchmark process failed:\n{stderr}")
+        return stdout
+
+    def measure(self, shards, options):
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            regions = {f'bench{i}': (0.0, float(i), 1.0, i + 0.9) for i in range(shards)}
+            databases = {
+                alias: {
+                    'ENGINE': 'django.db.backends.sqlite3',
+                    'NAME': str(directory / f'{alias}.sqlite3'),
+                    'OPTIONS': {'timeout': 60},
+                }
+                for alias in ['default', *regions]
+            }
+            (directory / 'bench_shard_settings.py').write_text(
+                SETTINGS_TEMPLATE.format(databases=databases, regions=regions)
+            )
+            self.wait(self.run_child(directory, ['setup', options['providers'], options['customers']]))
+            writers = [
+                self.run_child(directory, ['write', options['bookings'], seed]) for seed in range(options['writers'])
+            ]
+            windows = [json.loads(self.wait(writer).strip().splitlines()[-1]) for writer in writers]
+        elapsed = max(w['end'] for w in windows) - min(w['start'] for w in windows)
+        return options['writers'] * options['bookings'] / elapsed
+
+    def handle(self, *args, **options):
+        total = options['writers'] * options['bookings']
+        self.stdout.write(f"{options['writers']} writers x {options['bookings']} bookings = {total} inserts")
+        single = self.measure(0, options)
+        self.stdout.write(f"single database: {single:,.0f} bookings/s")
+        sharded = self.measure(options['shards'], options)
+        self.stdout.write(f"{options['shards']} region shards: {sharded:,.0f} bookings/s")
+        self.stdout.write(self.style.SUCCESS(f"Speedup: {sharded / single:.2f}x"))
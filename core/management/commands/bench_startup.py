@@ -0,0 +1,83 @@
+import json
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter and does what a gunicorn worker does at boot:
+# build the WSGI application (settings, apps, middleware) and load every view
+# through the URLconf.
+BOOT_SCRIPT = """
+import json, os, resource, sys, time
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cleanbase.settings')
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+elapsed = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform != 'darwin':
+    rss *= 1024
+print(json.dumps({'boot_ms': elapsed * 1000, 'rss_bytes': rss, 'modules': sorted(sys.modules)}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure worker boot time and RSS in fresh interpreters and report the "
+        "slowest imports (python -X importtime). Exits non-zero when a budget "
+        "is exceeded or a module that should load lazily is imported at boot."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--top', type=int, default=15, help="Number of slowest imports to list.")
+        parser.add_argument('--budget-ms', type=float, default=1000.0)
+        parser.add_argument('--budget-rss-mb', type=float, default=80.0)
+        parser.add_argument(
+            '--forbid', default='geopy,httpx',
+            help="Comma-separated top-level modules that must not be imported at boot.",
+        )
+
+    def boot(self, importtime=False):
+        command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', BOOT_SCRIPT]
+        result = subprocess.run(command, cwd=settings.BASE_DIR, capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(f"Boot failed:\n{result.stderr}")
+        return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+    def handle(self, *args, **options):
+        runs = [self.boot()[0] for _ in range(options['runs'])]
+        boot_ms = statistics.median(run['boot_ms'] for run in runs)
+        rss_mb = statistics.median(run['rss_bytes'] for run in runs) / 2 ** 20
+
+        _, importtime = self.boot(importtime=True)
+        imports = []
+        for line in importtime.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            imports.append((int(cumulative), name.rstrip()))
+        top_level = sorted((i for i in imports if not i[1].startswith('  ')), reverse=True)
+
+        self.stdout.write(f"boot: median {boot_ms:.1f} ms over {len(runs)} runs (budget {options['budget_ms']:.0f} ms)")
+        self.stdout.write(f"rss:  median {rss_mb:.1f} MB (budget {options['budget_rss_mb']:.0f} MB)")
+        self.stdout.write("slowest top-level imports (cumulative):")
+        for cumulative, name in top_level[:options['top']]:
+            self.stdout.write(f"  {cumulative / 1000:8.1f} ms  {name.strip()}")
+
+        problems = []
+        if boot_ms > options['budget_ms']:
+            problems.append(f"boot time {boot_ms:.1f} ms exceeds {options['budget_ms']:.0f} ms")
+        if rss_mb > options['budget_rss_mb']:
+            problems.append(f"RSS {rss_mb:.1f} MB exceeds {options['budget_rss_mb']:.0f} MB")
+        loaded = {module.split('.')[0] for module in runs[0]['modules']}
+        for module in filter(None, options['forbid'].split(',')):
+            if module in loaded:
+                problems.append(f"{module} is imported at boot")
+        if problems:
+            raise CommandError("; ".join(problems))
+        self.stdout.write(self.style.SUCCESS("Startup within budget."))
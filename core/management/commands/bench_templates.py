@@ -0,0 +1,38 @@
+import math
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from core.benchmarks import measure, scratch_database, seed_catalog, summarize
+from core.listings import rebuild_listings
+from core.view_templates import ServiceListView
+
+
+class Command(BaseCommand):
+    help = "Benchmark HTML render time of the service list page on a scratch database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--services', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            seed_catalog(options['services'])
+            rebuild_listings()
+            client = Client()
+
+            def render(path):
+                response = client.get(path)
+                assert response.status_code == 200, response.status_code
+
+            def cold(path):
+                cache.clear()
+                render(path)
+
+            repeat = options['repeat']
+            last_page = max(1, math.ceil(options['services'] / ServiceListView.paginate_by))
+            self.stdout.write(f"{options['services']} services")
+            for path in ('/services/', f'/services/?page={last_page}'):
+                self.stdout.write(summarize(f"{path} cold", measure(lambda: cold(path), repeat)))
+                self.stdout.write(summarize(f"{path} warm", measure(lambda: render(path), repeat)))
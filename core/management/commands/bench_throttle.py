@@ -0,0 +1,49 @@
+import statistics
+from contextlib import ExitStack
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.benchmarks import measure
+from core.throttling import TokenBucketThrottle
+
+
+class BenchView:
+    throttle_scope = 'bench'
+
+
+class Command(BaseCommand):
+    help = "Benchmark the per-request overhead of TokenBucketThrottle and fail if it exceeds the budget."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calls', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--budget-us', type=float, default=100.0)
+
+    def handle(self, *args, **options):
+        request = Request(APIRequestFactory().get('/', REMOTE_ADDR='203.0.113.7'))
+        request.user = AnonymousUser()
+        view = BenchView()
+
+        def check():
+            TokenBucketThrottle().allow_request(request, view)
+
+        failed = False
+        with override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': {'bench': '1000000/s'}}):
+            for label, cache_down in (('django cache', False), ('in-process fallback', True)):
+                with ExitStack() as stack:
+                    if cache_down:
+                        stack.enter_context(mock.patch.object(cache, 'get', side_effect=RuntimeError))
+                        stack.enter_context(mock.patch.object(cache, 'set', side_effect=RuntimeError))
+                    timings = measure(check, options['repeat'], options['calls'])
+                median_us = statistics.median(timings) * 1e6
+                self.stdout.write(f"{label}: median {median_us:.1f} us/request (min {min(timings) * 1e6:.1f} us)")
+                failed = failed or median_us > options['budget_us']
+
+        if failed:
+            raise CommandError(f"Throttle overhead exceeds the {options['budget_us']:.0f} us budget.")
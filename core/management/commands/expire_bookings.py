@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.lifecycle import COMPLETED, CONFIRMED, EXPIRED, PENDING, bulk_transition
+from core.models import Booking
+from core.sharding import shard_aliases
+
+
+class Command(BaseCommand):
+    help = (
+        "Expire unpaid pending bookings older than the TTL and complete "
+        "confirmed bookings whose time has passed. Meant to run periodically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ttl-minutes', type=int,
+            default=getattr(settings, 'BOOKING_PENDING_TTL_MINUTES', 30),
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        chunk_size = options['chunk_size']
+
+        expired = completed = 0
+        for alias in shard_aliases():
+            bookings = Booking.objects.using(alias)
+            expired += bulk_transition(
+                bookings.filter(
+                    status=PENDING, is_paid=False,
+                    created_at__lt=now - timedelta(minutes=options['ttl_minutes']),
+                ),
+                EXPIRED, chunk_size=chunk_size,
+            )
+            completed += bulk_transition(
+                bookings.filter(status=CONFIRMED, scheduled_time__lt=now),
+                COMPLETED, chunk_size=chunk_size,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {expired} pending bookings, completed {completed} confirmed bookings."
+        ))
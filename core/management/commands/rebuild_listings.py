@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core.listings import rebuild_listings
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the denormalized ServiceListing read model from Service, "
+        "ServiceProvider, ServiceCategory and Availability. Run it after bulk "
+        "imports. next_available_date is kept current by refresh_listing_dates."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = rebuild_listings(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} service listings."))
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.reconciliation import reconcile_payments
+
+
+class Command(BaseCommand):
+    help = (
+        "Verify unpaid bookings that have a payment reference against Paystack "
+        "and mark confirmed payments as paid. Resumes from the checkpoint file "
+        "left by an interrupted run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--concurrency', type=int, default=10, help="Maximum in-flight verify calls.")
+        parser.add_argument('--rate', type=float, default=20, help="Maximum verify calls started per second.")
+        parser.add_argument(
+            '--checkpoint', default=str(settings.BASE_DIR / 'reconcile_payments.checkpoint'),
+        )
+        parser.add_argument('--no-checkpoint', action='store_true')
+
+    def handle(self, *args, **options):
+        result = reconcile_payments(
+            batch_size=options['batch_size'],
+            concurrency=options['concurrency'],
+            rate=options['rate'],
+            checkpoint=None if options['no_checkpoint'] else options['checkpoint'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {result.checked} bookings: {result.paid} marked paid, {result.errors} lookups failed."
+        ))
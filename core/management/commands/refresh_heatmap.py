@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.heatmap import refresh_heatmap
+from core.models import ServiceCategory
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the supply/demand heatmap cells for every category over a "
+        "range of dates. Meant to run periodically next to the signal-driven refreshes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First date (YYYY-MM-DD), default today.")
+        parser.add_argument('--days', type=int, default=14)
+        parser.add_argument('--category', type=int, action='append', help="Only this category id (repeatable).")
+
+    def handle(self, *args, **options):
+        try:
+            start = datetime.strptime(options['start'], "%Y-%m-%d").date() if options['start'] else timezone.localdate()
+        except ValueError:
+            raise CommandError("--start must be YYYY-MM-DD")
+        category_ids = options['category'] or list(ServiceCategory.objects.values_list('pk', flat=True))
+
+        cells = 0
+        for offset in range(options['days']):
+            date = start + timedelta(days=offset)
+            for category_id in category_ids:
+                cells += refresh_heatmap(category_id, date)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {cells} cells for {len(category_ids)} categories over {options['days']} days."
+        ))
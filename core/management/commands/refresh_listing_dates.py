@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.listings import refresh_stale_dates
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute next_available_date for listings whose date has passed. "
+        "Meant to run daily shortly after midnight (TIME_ZONE)."
+    )
+
+    def handle(self, *args, **options):
+        updated = refresh_stale_dates()
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {updated} service listings."))
@@ -0,0 +1,60 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import taskqueue
+
+
+def init_process():
+    django.setup()
+    import core.tasks  # noqa: F401  registers the task functions
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks (see core.taskqueue)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread')
+        parser.add_argument(
+            '--visibility-timeout', type=int, default=300,
+            help="Seconds a claimed task stays invisible to other workers.",
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is drained.")
+
+    def handle(self, *args, **options):
+        import core.tasks  # noqa: F401
+
+        concurrency = options['concurrency']
+        if options['pool'] == 'process':
+            # Children must not inherit the parent's open database connection.
+            connections.close_all()
+            executor = ProcessPoolExecutor(max_workers=concurrency, initializer=init_process)
+        else:
+            executor = ThreadPoolExecutor(max_workers=concurrency)
+
+        # Claim only as many tasks as there are free slots, and refill a slot
+        # as soon as its task finishes, so one slow task doesn't stall the rest.
+        processed = 0
+        running = set()
+        with executor:
+            while True:
+                free = concurrency - len(running)
+                claimed = taskqueue.claim(free, options['visibility_timeout']) if free else []
+                running.update(executor.submit(taskqueue.execute, t.pk, t.lock_token) for t in claimed)
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                timeout = None if len(running) == concurrency else options['poll_interval']
+                done, running = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+                processed += len(done)
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} tasks."))
@@ -0,0 +1,45 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from core.models import ArchivedAvailability, ArchivedBooking, Availability, Booking
+from core.sharding import copy_reference_table, rehome_providers, relocate, reserve_id_block, shard_aliases
+from core.signals import MIRRORED_MODELS
+
+
+class Command(BaseCommand):
+    help = (
+        "Prepare the region shards: migrate them, reserve their id blocks, copy "
+        "the reference tables from 'default', move providers whose coordinates "
+        "changed region to that region's shard and move bookings and "
+        "availability stored in the wrong shard. Safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--skip-migrate', action='store_true')
+
+    def handle(self, *args, **options):
+        aliases = shard_aliases()
+        if len(aliases) == 1:
+            self.stdout.write("Sharding is off: no region databases are configured (set CLEANBASE_SHARDING=1).")
+            return
+
+        chunk_size = options['chunk_size']
+        for alias in aliases[1:]:
+            if not options['skip_migrate']:
+                call_command('migrate', database=alias, verbosity=0)
+            for model in (Booking, Availability):
+                reserve_id_block(alias, model)
+            for model in MIRRORED_MODELS:
+                copied = copy_reference_table(model, alias, chunk_size)
+                self.stdout.write(f"{alias}: copied {copied} {model._meta.label} rows")
+
+        rehomed = rehome_providers(chunk_size)
+        if rehomed:
+            self.stdout.write(f"moved {rehomed} providers to a new region")
+        for alias in aliases:
+            for model in (Booking, Availability, ArchivedBooking, ArchivedAvailability):
+                moved = relocate(model, alias, chunk_size)
+                if moved:
+                    self.stdout.write(f"{alias}: moved {moved} {model._meta.label} rows to their region")
+        self.stdout.write(self.style.SUCCESS(f"{len(aliases) - 1} shards in sync."))
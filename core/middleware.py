@@ -0,0 +1,41 @@
+from django.utils.functional import SimpleLazyObject
+
+from .models import Customer, ServiceProvider
+
+
+def get_customer(request):
+    if not hasattr(request, '_cached_customer'):
+        user = request.user
+        request._cached_customer = (
+            Customer.objects.select_related('user').filter(user=user).first()
+            if user.is_authenticated else None
+        )
+    return request._cached_customer
+
+
+def get_provider(request):
+    if not hasattr(request, '_cached_provider'):
+        user = request.user
+        request._cached_provider = (
+            ServiceProvider.objects.select_related('user').filter(user=user).first()
+            if user.is_authenticated else None
+        )
+    return request._cached_provider
+
+
+class ProfileMiddleware:
+    """
+    Attach lazy ``request.customer`` and ``request.provider`` attributes.
+
+    Each profile is looked up at most once per request, on first access. The
+    lookup reads ``request.user`` at that point, so it also sees users
+    authenticated later by DRF (e.g. via JWT).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.customer = SimpleLazyObject(lambda: get_customer(request))
+        request.provider = SimpleLazyObject(lambda: get_provider(request))
+        return self.get_response(request)
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.5 on 2026-10-19 17:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Min
+from django.utils import timezone
+
+
+def backfill_listings(apps, schema_editor):
+    Availability = apps.get_model('core', 'Availability')
+    Service = apps.get_model('core', 'Service')
+    ServiceListing = apps.get_model('core', 'ServiceListing')
+    db = schema_editor.connection.alias
+
+    next_dates = dict(
+        Availability.objects.using(db).filter(date__gte=timezone.localdate())
+        .values('provider_id').annotate(next_date=Min('date'))
+        .values_list('provider_id', 'next_date')
+    )
+    ServiceListing.objects.using(db).bulk_create([
+        ServiceListing(
+            service_id=s.id, title=s.title, price=s.price,
+            duration_minutes=s.duration_minutes, is_available=s.is_available,
+            provider_id=s.provider_id, provider_name=s.provider.user.username,
+            provider_rating=s.provider.rating, latitude=s.provider.latitude,
+            longitude=s.provider.longitude, category_id=s.category_id,
+            category_name=s.category.name,
+            next_available_date=next_dates.get(s.provider_id),
+        )
+        for s in Service.objects.using(db).select_related('provider__user', 'category')
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_customer_email_customer_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceListing',
+            fields=[
+                ('service', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='listing', serialize=False, to='core.service')),
+                ('title', models.CharField(max_length=255)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('duration_minutes', models.IntegerField()),
+                ('is_available', models.BooleanField(default=True)),
+                ('provider_name', models.CharField(max_length=150)),
+                ('provider_rating', models.FloatField(default=0.0)),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+                ('category_name', models.CharField(max_length=100)),
+                ('next_available_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.servicecategory')),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.serviceprovider')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['category', 'is_available'], name='core_servic_categor_9631e1_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_listings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import TruncDate
+
+
+def backfill_calendar_fields(apps, schema_editor):
+    Booking = apps.get_model('core', 'Booking')
+    Service = apps.get_model('core', 'Service')
+
+    Booking.objects.using(schema_editor.connection.alias).update(
+        provider_id=Subquery(Service.objects.filter(pk=OuterRef('service_id')).values('provider_id')[:1]),
+        scheduled_date=TruncDate('scheduled_time'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_servicelisting'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='provider',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='core.serviceprovider'),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='scheduled_date',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_calendar_fields, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='booking',
+            name='provider',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='core.serviceprovider'),
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='scheduled_date',
+            field=models.DateField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['provider', 'scheduled_date'], name='core_bookin_provide_a72cbe_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_task'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedAvailability',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('archived_at', models.DateTimeField()),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.serviceprovider')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['provider', 'date'], name='core_archiv_provide_a4de8e_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedBooking',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('scheduled_time', models.DateTimeField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('completed', 'Completed'), ('cancelled', 'Cancelled'), ('expired', 'Expired')], max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('address', models.TextField()),
+                ('is_paid', models.BooleanField(default=False)),
+                ('payment_reference', models.CharField(blank=True, max_length=255, null=True)),
+                ('scheduled_date', models.DateField()),
+                ('archived_at', models.DateTimeField()),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.customer')),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.serviceprovider')),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.service')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['provider', 'scheduled_date'], name='core_archiv_provide_669a8a_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_archivedavailability_archivedbooking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HeatmapCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('geohash', models.CharField(max_length=12)),
+                ('precision', models.PositiveSmallIntegerField()),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('providers', models.PositiveIntegerField(default=0)),
+                ('open_slots', models.PositiveIntegerField(default=0)),
+                ('bookings', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.servicecategory')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['category', 'date', 'precision', 'latitude'], name='core_heatma_categor_2f25d7_idx')],
+                'unique_together': {('category', 'date', 'geohash')},
+            },
+        ),
+    ]
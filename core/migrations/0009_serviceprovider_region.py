@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:10
+
+from django.db import migrations, models
+
+from core.sharding import region_for
+
+
+def backfill_regions(apps, schema_editor):
+    ServiceProvider = apps.get_model('core', 'ServiceProvider')
+    providers = ServiceProvider.objects.using(schema_editor.connection.alias)
+    for provider in providers.exclude(latitude=None).exclude(longitude=None):
+        region = region_for(provider.latitude, provider.longitude)
+        if region != provider.region:
+            providers.filter(pk=provider.pk).update(region=region)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_heatmapcell'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='region',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=32),
+        ),
+        migrations.RunPython(backfill_regions, migrations.RunPython.noop),
+    ]
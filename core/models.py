@@ -1,5 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
+
+from .sharding import ShardedQuerySet, region_for
 
 class User(AbstractUser):
     is_customer = models.BooleanField(default=False)
@@ -20,6 +23,14 @@ class ServiceProvider(models.Model):
     rating = models.FloatField(default=0.0)
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
+    # Derived from latitude/longitude (settings.REGIONS) on creation; picks the
+    # shard. Later moves take effect in sync_shards, see core.sharding.
+    region = models.CharField(max_length=32, blank=True, default='', editable=False, db_index=True)
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.region = region_for(self.latitude, self.longitude)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.user.username
@@ -60,11 +71,32 @@ class Booking(models.Model):
         ('confirmed', 'Confirmed'),
         ('completed', 'Completed'),
         ('cancelled', 'Cancelled'),
+        ('expired', 'Expired'),
     ]
     status = models.CharField(max_length=20, choices=status_choices, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
     address = models.TextField()
     is_paid = models.BooleanField(default=False)
     payment_reference = models.CharField(max_length=255, blank=True, null=True)
+    # Denormalized from service.provider and scheduled_time for calendar queries.
+    provider = models.ForeignKey(ServiceProvider, on_delete=models.CASCADE, editable=False, related_name='bookings')
+    scheduled_date = models.DateField(editable=False)
+
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['provider', 'scheduled_date']),
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.provider_id = self.service.provider_id
+        scheduled_time = self.scheduled_time
+        if timezone.is_aware(scheduled_time):
+            scheduled_time = timezone.localtime(scheduled_time)
+        self.scheduled_date = scheduled_time.date()
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.customer.user.username} -> {self.service.title} on {self.scheduled_time}"
@@ -77,9 +109,132 @@ class Availability(models.Model):
     start_time = models.TimeField()
     end_time = models.TimeField()
 
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         unique_together = ['provider', 'date', 'start_time']
 
     def __str__(self):
         return f"{self.provider.user.username}: {self.date} - {self.start_time} to {self.end_time}"
-        
+
+
+class ArchivedBooking(models.Model):
+    """A finished booking moved out of Booking by core.archive; same columns plus archived_at."""
+    id = models.BigIntegerField(primary_key=True)
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='+')
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='+')
+    scheduled_time = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=Booking.status_choices)
+    created_at = models.DateTimeField()
+    address = models.TextField()
+    is_paid = models.BooleanField(default=False)
+    payment_reference = models.CharField(max_length=255, blank=True, null=True)
+    provider = models.ForeignKey(ServiceProvider, on_delete=models.CASCADE, related_name='+')
+    scheduled_date = models.DateField()
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['provider', 'scheduled_date']),
+        ]
+
+    def __str__(self):
+        return f"Booking {self.pk} on {self.scheduled_time} (archived)"
+
+
+class ArchivedAvailability(models.Model):
+    """A past availability slot moved out of Availability by core.archive."""
+    id = models.BigIntegerField(primary_key=True)
+    provider = models.ForeignKey(ServiceProvider, on_delete=models.CASCADE, related_name='+')
+    date = models.DateField()
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['provider', 'date']),
+        ]
+
+    def __str__(self):
+        return f"Availability {self.pk}: {self.date} (archived)"
+
+
+class ServiceListing(models.Model):
+    """Flattened, denormalized copy of a service card, maintained by core.listings."""
+    service = models.OneToOneField(Service, on_delete=models.CASCADE, primary_key=True, related_name='listing')
+    title = models.CharField(max_length=255)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    duration_minutes = models.IntegerField()
+    is_available = models.BooleanField(default=True)
+    provider = models.ForeignKey(ServiceProvider, on_delete=models.CASCADE, related_name='+')
+    provider_name = models.CharField(max_length=150)
+    provider_rating = models.FloatField(default=0.0)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    category = models.ForeignKey(ServiceCategory, on_delete=models.CASCADE, related_name='+')
+    category_name = models.CharField(max_length=100)
+    next_available_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['category', 'is_available']),
+        ]
+
+    def __str__(self):
+        return f"{self.title} by {self.provider_name}"
+
+
+class HeatmapCell(models.Model):
+    """Supply/demand counts for one geohash cell, category and date, maintained by core.heatmap."""
+    category = models.ForeignKey(ServiceCategory, on_delete=models.CASCADE, related_name='+')
+    date = models.DateField()
+    geohash = models.CharField(max_length=12)
+    precision = models.PositiveSmallIntegerField()
+    # Centre of the cell.
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    providers = models.PositiveIntegerField(default=0)
+    open_slots = models.PositiveIntegerField(default=0)
+    bookings = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['category', 'date', 'geohash']
+        indexes = [
+            models.Index(fields=['category', 'date', 'precision', 'latitude']),
+        ]
+
+    def __str__(self):
+        return f"{self.geohash} on {self.date}"
+
+
+class Task(models.Model):
+    """A unit of background work, run by the ``run_tasks`` worker (see core.taskqueue)."""
+    status_choices = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('dead', 'Dead'),
+    ]
+    name = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=status_choices, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    lock_token = models.CharField(max_length=32, blank=True, default='')
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+            models.Index(fields=['lock_token']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} [{self.status}]"
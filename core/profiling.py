@@ -0,0 +1,260 @@
+"""
+Opt-in request profiling.
+
+When ``PROFILING['ENABLED']`` is set, :class:`ProfilingMiddleware` can capture a
+profile of a single request. A capture happens when either:
+
+* the request asks for it: it carries the ``X-Profile`` header (with the
+  value of ``PROFILING['TOKEN']`` if one is configured, otherwise from a staff
+  user), or comes from a staff user who switched profiling on for their
+  session; such requests also run under ``cProfile``. For API clients the
+  JWT in the Authorization header is verified up front to make the staff
+  check (the session toggle only applies to session-authenticated
+  requests); or
+* the request takes longer than ``PROFILING['SLOW_REQUEST_MS']``.
+
+Stacks are collected by one shared background thread that samples every
+request thread in flight every ``SAMPLE_INTERVAL`` seconds. The samples of
+fast requests are thrown away. SQL statements and their timings are recorded
+alongside.
+
+Each capture is written to ``PROFILING['DIR']`` as ``<name>.json`` (request
+metadata and SQL), ``<name>.folded`` (collapsed stacks, the input format of
+flamegraph.pl and speedscope) and, for explicit captures, ``<name>.prof``
+(pstats). Only the newest ``MAX_PROFILES`` captures are kept.
+"""
+import cProfile
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+DEFAULTS = {
+    'ENABLED': False,
+    'DIR': settings.BASE_DIR / 'profiles',
+    'TOKEN': None,
+    'SLOW_REQUEST_MS': 1000,
+    'SAMPLE_INTERVAL': 0.005,
+    'MAX_PROFILES': 200,
+}
+
+SESSION_KEY = 'profile_requests'
+PROFILE_SUFFIXES = ('.json', '.folded', '.prof')
+PROFILE_NAME_RE = re.compile(r'^[\w.-]+$')
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'PROFILING', {})}
+
+
+def fold_stack(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{frame.f_globals.get('__name__', '?')}.{getattr(code, 'co_qualname', code.co_name)}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler(threading.Thread):
+    """Background thread that samples the stacks of registered threads."""
+
+    def __init__(self, interval):
+        super().__init__(name='request-stack-sampler', daemon=True)
+        self.interval = interval
+        self.targets = {}
+        self.lock = threading.Lock()
+
+    def watch(self, thread_id):
+        samples = Counter()
+        with self.lock:
+            self.targets[thread_id] = samples
+        return samples
+
+    def unwatch(self, thread_id):
+        with self.lock:
+            self.targets.pop(thread_id, None)
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                if not self.targets:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, samples in self.targets.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        samples[fold_stack(frame)] += 1
+
+
+class SQLRecorder:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'ms': round((time.perf_counter() - start) * 1000, 3),
+            })
+
+
+def list_profiles(directory=None):
+    directory = Path(directory or get_config()['DIR'])
+    profiles = []
+    for path in sorted(directory.glob('*.json'), reverse=True):
+        try:
+            profiles.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def profile_path(name, suffix, directory=None):
+    """Return the file for a stored profile, or None if ``name`` is not a valid profile name."""
+    if not PROFILE_NAME_RE.match(name) or suffix not in PROFILE_SUFFIXES:
+        return None
+    path = Path(directory or get_config()['DIR']) / f"{name}{suffix}"
+    return path if path.is_file() else None
+
+
+def rotate(directory, keep):
+    names = sorted(path.stem for path in directory.glob('*.json'))
+    for name in names[:max(len(names) - keep, 0)]:
+        for suffix in PROFILE_SUFFIXES:
+            (directory / f"{name}{suffix}").unlink(missing_ok=True)
+
+
+class ProfilingMiddleware:
+    sampler = None
+    sampler_lock = threading.Lock()
+
+    def __init__(self, get_response):
+        self.config = get_config()
+        if not self.config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.directory = Path(self.config['DIR'])
+        self.ensure_sampler()
+
+    def ensure_sampler(self):
+        # With gunicorn's preload_app the middleware is built in the master and
+        # the sampler thread does not survive the fork, so restart it per worker.
+        sampler = ProfilingMiddleware.sampler
+        if sampler is not None and sampler.is_alive():
+            return sampler
+        with self.sampler_lock:
+            if ProfilingMiddleware.sampler is None or not ProfilingMiddleware.sampler.is_alive():
+                ProfilingMiddleware.sampler = StackSampler(self.config['SAMPLE_INTERVAL'])
+                ProfilingMiddleware.sampler.start()
+            return ProfilingMiddleware.sampler
+
+    def is_staff(self, request):
+        user = getattr(request, 'user', None)
+        return bool(user and user.is_authenticated and user.is_staff)
+
+    def jwt_user(self, request):
+        """The user of a valid JWT in the Authorization header, or None."""
+        from rest_framework.exceptions import AuthenticationFailed
+        from rest_framework_simplejwt.authentication import JWTAuthentication
+
+        try:
+            authenticated = JWTAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return None
+        return authenticated[0] if authenticated else None
+
+    def is_requested(self, request):
+        """True if the request asked for a capture."""
+        header = request.headers.get('X-Profile')
+        token = self.config['TOKEN']
+        if header and token and header == token:
+            return True
+        staff_header = bool(header) and not token
+        if self.is_staff(request):
+            session = getattr(request, 'session', None)
+            return staff_header or bool(session is not None and session.get(SESSION_KEY, False))
+        if staff_header and 'Authorization' in request.headers:
+            # DRF only authenticates the token inside the view, too late to
+            # decide whether to run cProfile.
+            user = self.jwt_user(request)
+            return bool(user and user.is_staff)
+        return False
+
+    def __call__(self, request):
+        requested = self.is_requested(request)
+        slow_ms = self.config['SLOW_REQUEST_MS']
+        if not requested and slow_ms is None:
+            return self.get_response(request)
+
+        thread_id = threading.get_ident()
+        sampler = self.ensure_sampler()
+        samples = sampler.watch(thread_id)
+        recorder = SQLRecorder()
+        profiler = cProfile.Profile() if requested else None
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                if profiler is not None:
+                    try:
+                        profiler.enable()
+                    except ValueError:
+                        # Another profiler is already active in this process.
+                        profiler = None
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+        finally:
+            sampler.unwatch(thread_id)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        if requested or (slow_ms is not None and elapsed_ms >= slow_ms):
+            self.save(request, response, elapsed_ms, 'requested' if requested else 'slow', samples, recorder, profiler)
+        return response
+
+    def save(self, request, response, elapsed_ms, trigger, samples, recorder, profiler):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r'[^\w-]+', '-', request.path).strip('-')[:60] or 'root'
+        name = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:6]}-{slug}"
+        metadata = {
+            'name': name,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'trigger': trigger,
+            'duration_ms': round(elapsed_ms, 3),
+            'samples': sum(samples.values()),
+            'sample_interval': self.config['SAMPLE_INTERVAL'],
+            'sql_count': len(recorder.queries),
+            'sql_ms': round(sum(q['ms'] for q in recorder.queries), 3),
+            'sql': recorder.queries,
+            'has_cprofile': profiler is not None,
+        }
+        (self.directory / f"{name}.folded").write_text(
+            ''.join(f"{stack} {count}\n" for stack, count in samples.most_common())
+        )
+        if profiler is not None:
+            profiler.dump_stats(os.fspath(self.directory / f"{name}.prof"))
+        # The .json file is written last: its presence marks a complete capture.
+        (self.directory / f"{name}.json").write_text(json.dumps(metadata, indent=1))
+        rotate(self.directory, self.config['MAX_PROFILES'])
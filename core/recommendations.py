@@ -0,0 +1,168 @@
+"""
+Provider recommendations and their in-process candidate cache.
+
+``recommend_providers`` is called with nearly identical parameters while a
+user pans the map, so the database work behind it (the category's listings,
+their average price, the providers with a slot that day and their serialized
+data) is memoized per (category, date, location cell). Coordinates are snapped
+to a grid of ``CELL_DEGREES`` to pick the entry; distances, scores and the
+ordering are still computed per request from the caller's exact location.
+Entries expire after ``TTL`` seconds and the least recently used are evicted
+beyond ``MAX_ENTRIES`` (see ``RECOMMENDATION_CACHE`` in settings).
+
+Model signals invalidate entries when services, providers or availability
+change. A build that overlaps an invalidation isn't stored, since it may have
+read the old rows. The cache is per process, so other workers see such changes
+once their own entries expire.
+
+Every lookup sends :data:`recommendation_cache_event` with ``event`` set to
+``'hit'`` or ``'miss'``, and invalidations send ``'invalidate'``; connect to it
+to export hit rates. :meth:`RecommendationCache.stats` returns running totals.
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+from django.dispatch import Signal
+
+from .models import Availability, ServiceListing, ServiceProvider
+from .serializers import ServiceProviderSerializer
+from .sharding import gather
+
+recommendation_cache_event = Signal()
+
+
+def load_candidates(category_id, date):
+    """
+    Return the category's listings whose provider has a slot on ``date``, with
+    everything needed to rank them, or None if the category has no services.
+    """
+    # statistics is only needed here; keep it out of worker boot.
+    from statistics import mean
+
+    listings = list(ServiceListing.objects.filter(category_id=category_id, is_available=True))
+    if not listings:
+        return None
+
+    avg_price = mean([float(l.price) for l in listings])
+    providers_with_slot = set(gather(Availability.objects.filter(
+        provider_id__in={l.provider_id for l in listings}, date=date
+    ).values_list('provider_id', flat=True), key=None))
+    providers = ServiceProvider.objects.select_related('user').in_bulk(providers_with_slot)
+
+    return [
+        {
+            "provider": ServiceProviderSerializer(providers[listing.provider_id]).data,
+            "service_id": listing.service_id,
+            "service_title": listing.title,
+            "price": float(listing.price),
+            "location": (listing.latitude, listing.longitude),
+            "rating": listing.provider_rating,
+            "price_factor": float(listing.price) / avg_price if avg_price else 1.0,
+        }
+        for listing in listings
+        if listing.latitude and listing.longitude and listing.provider_id in providers_with_slot
+    ]
+
+
+def rank(candidates, user_location):
+    """Score ``candidates`` by distance from ``user_location``, best first."""
+    # geopy is only needed here; keep it out of worker boot.
+    from geopy.distance import geodesic
+
+    recommendations = []
+    for candidate in candidates:
+        distance_km = geodesic(user_location, candidate["location"]).km
+        score = (
+            -candidate["rating"] * 2 +
+            distance_km * 1.5 +
+            candidate["price_factor"] * 2
+        )
+
+        recommendations.append({
+            "provider": candidate["provider"],
+            "service_id": candidate["service_id"],
+            "service_title": candidate["service_title"],
+            "price": candidate["price"],
+            "distance_km": round(distance_km, 2),
+            "score": round(score, 2)
+        })
+
+    recommendations.sort(key=lambda x: x["score"])
+    return recommendations
+
+
+class RecommendationCache:
+    def __init__(self, cell_degrees=0.005, ttl=60, max_entries=1024):
+        self.cell_degrees = cell_degrees
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        # Bumped by every invalidation; a build that straddles one isn't stored.
+        self.generation = 0
+
+    def cell(self, lat, lng):
+        return round(lat / self.cell_degrees), round(lng / self.cell_degrees)
+
+    def get_or_build(self, category_id, date, lat, lng):
+        key = (str(category_id), str(date), self.cell(lat, lng))
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                hit = True
+            else:
+                self.misses += 1
+                hit = False
+            generation = self.generation
+        recommendation_cache_event.send(sender=self.__class__, event='hit' if hit else 'miss', key=key)
+        if hit:
+            candidates = entry[1]
+        else:
+            candidates = load_candidates(category_id, date)
+            with self.lock:
+                if self.generation == generation:
+                    self.entries[key] = (now + self.ttl, candidates)
+                    self.entries.move_to_end(key)
+                    while len(self.entries) > self.max_entries:
+                        self.entries.popitem(last=False)
+        return None if candidates is None else rank(candidates, (lat, lng))
+
+    def invalidate(self, category_ids=None, date=None):
+        """Drop entries for ``category_ids`` (all if None) and, if given, only for ``date``."""
+        categories = None if category_ids is None else {str(c) for c in category_ids}
+        with self.lock:
+            self.generation += 1
+            stale = [
+                key for key in self.entries
+                if (categories is None or key[0] in categories) and (date is None or key[1] == str(date))
+            ]
+            for key in stale:
+                del self.entries[key]
+        recommendation_cache_event.send(
+            sender=self.__class__, event='invalidate', key=None, count=len(stale)
+        )
+        return len(stale)
+
+    def clear(self):
+        return self.invalidate()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self.entries),
+        }
+
+
+recommendation_cache = RecommendationCache(**{
+    key.lower(): value for key, value in getattr(settings, 'RECOMMENDATION_CACHE', {}).items()
+})
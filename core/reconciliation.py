@@ -0,0 +1,139 @@
+"""
+Reconcile unpaid bookings against Paystack's transaction verify API.
+
+Bookings that have a ``payment_reference`` but are not marked paid (e.g.
+because a webhook call was lost) are verified in pk order, one batch at a
+time. Within a batch the verify calls fan out concurrently over a single
+pooled ``httpx.AsyncClient``, bounded by ``concurrency`` in-flight requests
+and ``rate`` request starts per second. Confirmed payments are applied with
+one UPDATE per batch, bookings still pending are then confirmed, and the
+last pk of each shard is written to the checkpoint file so an interrupted
+run resumes where it stopped.
+"""
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import quote
+
+import httpx
+from django.conf import settings
+
+from .lifecycle import CONFIRMED, bulk_transition
+from .models import Booking
+from .sharding import shard_aliases
+
+
+@dataclass
+class ReconcileResult:
+    checked: int = 0
+    paid: int = 0
+    errors: int = 0
+
+
+class RateLimiter:
+    """Space request starts so that at most ``rate`` begin per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def make_client(concurrency, timeout=10.0):
+    return httpx.AsyncClient(
+        base_url=settings.PAYSTACK_BASE_URL,
+        headers={"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"},
+        timeout=timeout,
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+    )
+
+
+async def verify_references(client, references, concurrency, limiter):
+    """Return ``{reference: gateway status}``; the status is None if the lookup failed."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def verify(reference):
+        async with semaphore:
+            await limiter.wait()
+            try:
+                response = await client.get(f"/transaction/verify/{quote(reference, safe='')}")
+                data = response.json()
+            except (httpx.HTTPError, ValueError):
+                return reference, None
+            if response.status_code != 200 or not data.get('status'):
+                return reference, None
+            return reference, data['data'].get('status')
+
+    return dict(await asyncio.gather(*(verify(reference) for reference in references)))
+
+
+def load_checkpoint(path):
+    """Return ``{alias: last_pk}`` from the checkpoint file, or {} if there is none."""
+    try:
+        data = json.loads(Path(path).read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+    if 'last_pk' in data:
+        # Written before checkpoints were kept per shard.
+        return {'default': data['last_pk']}
+    return data.get('shards', {})
+
+
+def save_checkpoint(path, last_pks):
+    path = Path(path)
+    tmp = path.with_suffix(path.suffix + '.tmp')
+    tmp.write_text(json.dumps({'shards': last_pks}))
+    tmp.replace(path)
+
+
+def reconcile_payments(batch_size=100, concurrency=10, rate=20, checkpoint=None):
+    last_pks = load_checkpoint(checkpoint) if checkpoint else {}
+    unpaid = Booking.objects.filter(is_paid=False, payment_reference__isnull=False) \
+        .exclude(payment_reference='').order_by('pk')
+    result = ReconcileResult()
+
+    loop = asyncio.new_event_loop()
+    client = make_client(concurrency)
+    limiter = RateLimiter(rate)
+    try:
+        # Each shard keeps its own checkpoint: sync_shards moves rows between
+        # shards with their ids, so a shard can hold ids below another's block.
+        for alias in shard_aliases():
+            last_pk = last_pks.get(alias, 0)
+            while True:
+                batch = list(
+                    unpaid.using(alias).filter(pk__gt=last_pk).values_list('pk', 'payment_reference')[:batch_size]
+                )
+                if not batch:
+                    break
+                statuses = loop.run_until_complete(
+                    verify_references(client, [reference for _, reference in batch], concurrency, limiter)
+                )
+                paid = [reference for reference, status in statuses.items() if status == 'success']
+                if paid:
+                    paid_bookings = Booking.objects.using(alias).filter(payment_reference__in=paid)
+                    result.paid += paid_bookings.filter(is_paid=False).update(is_paid=True)
+                    bulk_transition(paid_bookings, CONFIRMED)
+                result.checked += len(batch)
+                result.errors += sum(1 for status in statuses.values() if status is None)
+                last_pk = last_pks[alias] = batch[-1][0]
+                if checkpoint:
+                    save_checkpoint(checkpoint, last_pks)
+    finally:
+        loop.run_until_complete(client.aclose())
+        loop.close()
+
+    if checkpoint:
+        Path(checkpoint).unlink(missing_ok=True)
+    return result
+
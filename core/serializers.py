@@ -1,11 +1,15 @@
 from rest_framework import serializers
+from rest_framework.validators import UniqueTogetherValidator
 from .models import (
     User, Customer, ServiceProvider, ServiceCategory,
-    Service, Booking, Availability
+    Service, Booking, Availability, ServiceListing,
+    ArchivedBooking, ArchivedAvailability
 )
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from .models import Customer, ServiceProvider
+from .lifecycle import CUSTOMER_STATUSES, PENDING, can_transition
+from .sharding import shard_for_provider
 
 User = get_user_model()
 
@@ -63,7 +67,8 @@ class ServiceProviderSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ServiceProvider
-        fields = '__all__'
+        # region is the provider's shard, maintained by sync_shards.
+        exclude = ['region']
 
 
 class ServiceCategorySerializer(serializers.ModelSerializer):
@@ -82,15 +87,66 @@ class ServiceSerializer(serializers.ModelSerializer):
 
 
 class BookingSerializer(serializers.ModelSerializer):
-    customer = CustomerSerializer()
-    service = ServiceSerializer()
+    customer = CustomerSerializer(read_only=True)
+    service = ServiceSerializer(read_only=True)
+    service_id = serializers.PrimaryKeyRelatedField(
+        source='service', queryset=Service.objects.all(), write_only=True
+    )
 
     class Meta:
         model = Booking
-        fields = '__all__'
+        exclude = ['provider', 'scheduled_date']
+        read_only_fields = ['is_paid', 'payment_reference']
+
+    def validate_service_id(self, value):
+        if self.instance is not None and value != self.instance.service:
+            raise serializers.ValidationError("The service of a booking can't be changed.")
+        return value
+
+    def validate_status(self, value):
+        if self.instance is None and value != PENDING:
+            raise serializers.ValidationError(f"New bookings start as {PENDING}.")
+        if self.instance is not None and value != self.instance.status:
+            if not can_transition(self.instance.status, value):
+                raise serializers.ValidationError(
+                    f"Cannot change status from {self.instance.status} to {value}."
+                )
+            request = self.context.get('request')
+            if request is not None and not request.user.is_staff and value not in CUSTOMER_STATUSES:
+                raise serializers.ValidationError("Customers may only cancel a booking.")
+        return value
+
+
+class ArchivedBookingSerializer(BookingSerializer):
+    class Meta:
+        model = ArchivedBooking
+        exclude = ['provider', 'scheduled_date']
+
         
 class AvailabilitySerializer(serializers.ModelSerializer):
     class Meta:
         model = Availability
         fields = '__all__'
-        
+
+    def run_validators(self, value):
+        # The unique_together check must read the provider's shard; an
+        # unhinted query on the default manager is routed to 'default'.
+        provider = value.get('provider', getattr(self.instance, 'provider', None))
+        if provider is not None:
+            db = shard_for_provider(provider.pk)
+            for validator in self.validators:
+                if isinstance(validator, UniqueTogetherValidator):
+                    validator.queryset = validator.queryset.using(db)
+        super().run_validators(value)
+
+
+class ArchivedAvailabilitySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ArchivedAvailability
+        fields = '__all__'
+
+
+class ServiceListingSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ServiceListing
+        fields = '__all__'
@@ -0,0 +1,298 @@
+"""
+Region sharding for bookings and availability.
+
+Every provider gets a region from its coordinates (``settings.REGIONS``) when
+it is created. With
+sharding enabled each region has its own database, named after the region,
+holding the Booking and Availability rows (and their archives) of that
+region's providers; providers outside every region stay in 'default'. All
+other tables live in 'default' and are mirrored into each shard by
+core.signals, so foreign keys and joins keep working inside a shard.
+
+* :class:`RegionRouter` routes a sharded row to its shard whenever Django
+  passes an instance hint (saves, related managers, ``objects.create``).
+* Provider-scoped queries pick their shard explicitly:
+  ``Booking.objects.using(shard_for_provider(provider_id))``.
+* Queries across providers go through :func:`gather`, which runs them on every
+  shard in parallel and merges the results.
+* Each shard allocates ids from its own block of ``ID_BLOCK`` ids, so ids stay
+  unique across shards and :func:`locate` finds a row by id in one query.
+
+A provider's region stays pinned when its coordinates change: its rows only
+change shard in ``manage.py sync_shards``, which migrates the shards, reserves
+their id blocks, copies the reference tables, rehomes providers that moved
+(see :func:`rehome_providers`) and moves any other rows that are in the wrong
+shard. Regions are looked up in 'default' on every call rather than cached, so
+every process sees a rehomed provider at once.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from operator import attrgetter
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, models
+
+ID_BLOCK = 10 ** 12
+
+# Models (app label 'core') whose rows are stored in their provider's shard.
+SHARDED_MODELS = {'booking', 'availability', 'archivedbooking', 'archivedavailability'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def region_for(latitude, longitude):
+    if latitude is None or longitude is None:
+        return ''
+    for region, (min_lat, min_lng, max_lat, max_lng) in getattr(settings, 'REGIONS', {}).items():
+        if min_lat <= latitude <= max_lat and min_lng <= longitude <= max_lng:
+            return region
+    return ''
+
+
+def shard_aliases():
+    """Database aliases of all shards; the position of an alias is its id block."""
+    return ['default'] + [region for region in getattr(settings, 'REGIONS', {}) if region in settings.DATABASES]
+
+
+def is_enabled():
+    return len(shard_aliases()) > 1
+
+
+def is_sharded(model):
+    return model._meta.app_label == 'core' and model._meta.model_name in SHARDED_MODELS
+
+
+def shard_for_region(region):
+    return region if region and region in settings.DATABASES else 'default'
+
+
+def shard_for_provider(provider_id):
+    if not is_enabled() or provider_id is None:
+        return 'default'
+    from .models import ServiceProvider
+
+    region = ServiceProvider.objects.using('default').filter(pk=provider_id).values_list('region', flat=True)
+    return shard_for_region(region.first() or '')
+
+
+def shard_for_pk(pk):
+    aliases = shard_aliases()
+    index = int(pk) // ID_BLOCK
+    return aliases[index] if 0 <= index < len(aliases) else 'default'
+
+
+def locate(queryset, pk):
+    """Return the object with ``pk`` from whichever shard holds it, or None."""
+    try:
+        home = shard_for_pk(pk)
+    except (TypeError, ValueError):
+        return None
+    for alias in [home] + [alias for alias in shard_aliases() if alias != home]:
+        obj = queryset.using(alias).filter(pk=pk).first()
+        if obj is not None:
+            return obj
+    return None
+
+
+def _evaluate(convert, queryset):
+    try:
+        return convert(queryset)
+    finally:
+        connections.close_all()
+
+
+def gather(queryset, convert=list, key=attrgetter('pk')):
+    """
+    Evaluate ``convert(queryset)`` on every shard and merge the results.
+
+    Each shard's result must be sorted by ``key``; pass ``key=None`` to
+    concatenate instead. 'default' is read in the calling thread, so it sees
+    the current transaction; the other shards are read from a thread pool.
+    """
+    global _executor
+    aliases = shard_aliases()
+    if len(aliases) == 1:
+        return convert(queryset.using(aliases[0]))
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(thread_name_prefix='shard-gather')
+    futures = [_executor.submit(_evaluate, convert, queryset.using(alias)) for alias in aliases[1:]]
+    results = [convert(queryset.using(aliases[0]))] + [future.result() for future in futures]
+    rows = [row for result in results for row in result]
+    if key is not None:
+        # Timsort merges the already sorted runs in linear time.
+        rows.sort(key=key)
+    return rows
+
+
+def reserve_id_block(alias, model):
+    """Make ``model`` ids on shard ``alias`` start at its block (index * ID_BLOCK)."""
+    start = shard_aliases().index(alias) * ID_BLOCK
+    if not start:
+        return
+    connection = connections[alias]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = %s", [table])
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)", [table, start])
+            elif row[0] < start:
+                cursor.execute("UPDATE sqlite_sequence SET seq = %s WHERE name = %s", [start, table])
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT setval(pg_get_serial_sequence(%s, 'id'), GREATEST(%s, (SELECT COALESCE(MAX(id), 0) FROM "
+                + connection.ops.quote_name(table) + ")))",
+                [table, start],
+            )
+        else:
+            raise NotImplementedError(f"Cannot reserve id blocks on {connection.vendor}.")
+
+
+def mirror(model, objs, alias):
+    """Insert or update copies of reference rows ``objs`` on shard ``alias``."""
+    fields = model._meta.concrete_fields
+    clones = [model(**{field.attname: getattr(obj, field.attname) for field in fields}) for obj in objs]
+    model._base_manager.using(alias).bulk_create(
+        clones, update_conflicts=True,
+        unique_fields=[model._meta.pk.name],
+        update_fields=[field.name for field in fields if not field.primary_key],
+    )
+
+
+def copy_reference_table(model, alias, chunk_size=1000):
+    """Make ``model`` on shard ``alias`` an exact copy of 'default'. Returns the number of rows copied."""
+    source = model._base_manager.using('default').order_by('pk')
+    copied, last_pk = 0, None
+    while True:
+        chunk = source if last_pk is None else source.filter(pk__gt=last_pk)
+        objs = list(chunk[:chunk_size])
+        if not objs:
+            break
+        mirror(model, objs, alias)
+        copied += len(objs)
+        last_pk = objs[-1].pk
+    stale = set(model._base_manager.using(alias).values_list('pk', flat=True)) \
+        - set(source.values_list('pk', flat=True))
+    if stale:
+        model._base_manager.using(alias).filter(pk__in=stale).delete()
+    return copied
+
+
+def delete_rows(model, alias, pks):
+    """
+    Delete rows of ``model`` by primary key on ``alias`` with one DELETE
+    statement, without collecting related rows or sending delete signals.
+    Only for models that no other table references. Returns the number deleted.
+    """
+    if not pks:
+        return 0
+    connection = connections[alias]
+    quote = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(pks))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {quote(model._meta.db_table)} WHERE {quote(model._meta.pk.column)} IN ({placeholders})",
+            list(pks),
+        )
+        return cursor.rowcount
+
+
+def transfer(model, provider_id, source, target, chunk_size=1000):
+    """
+    Move the rows of ``provider_id`` in a sharded ``model`` from shard
+    ``source`` to ``target``. Rows keep their ids. Each chunk is inserted into
+    the target (skipping rows already there) before it is deleted from the
+    source, so an interrupted move can be repeated. Returns the number moved.
+    """
+    columns = [field.attname for field in model._meta.concrete_fields]
+    rows_here = model._base_manager.using(source).filter(provider_id=provider_id).order_by('pk')
+    moved = 0
+    while True:
+        rows = list(rows_here.values(*columns)[:chunk_size])
+        if not rows:
+            return moved
+        model._base_manager.using(target).bulk_create((model(**row) for row in rows), ignore_conflicts=True)
+        # The rows still exist, so the delete signals must not fire.
+        delete_rows(model, source, [row['id'] for row in rows])
+        moved += len(rows)
+
+
+def relocate(model, alias, chunk_size=1000):
+    """Move rows of a sharded ``model`` stored on ``alias`` whose provider belongs to another shard."""
+    moved = 0
+    for provider_id in set(model._base_manager.using(alias).values_list('provider_id', flat=True).distinct()):
+        target = shard_for_provider(provider_id)
+        if target != alias:
+            moved += transfer(model, provider_id, alias, target, chunk_size)
+    return moved
+
+
+def rehome_providers(chunk_size=1000):
+    """
+    Give each provider whose coordinates now fall in another region that
+    region, moving its rows to the new shard. Returns the providers rehomed.
+
+    Rows are copied before the region switches and whatever was written to
+    the old shard in between is moved right after, so provider-scoped reads
+    (double-booking checks, available slots) only miss rows for that moment.
+    """
+    from .models import ServiceProvider
+
+    sharded_models = [apps.get_model('core', name) for name in sorted(SHARDED_MODELS)]
+    providers = ServiceProvider.objects.using('default')
+    rehomed = 0
+    for provider in providers.order_by('pk').iterator():
+        region = region_for(provider.latitude, provider.longitude)
+        if region == provider.region:
+            continue
+        source, target = shard_for_region(provider.region), shard_for_region(region)
+        for model in sharded_models if source != target else ():
+            transfer(model, provider.pk, source, target, chunk_size)
+        providers.filter(pk=provider.pk).update(region=region)
+        provider.region = region
+        for alias in shard_aliases()[1:]:
+            mirror(ServiceProvider, [provider], alias)
+        for model in sharded_models if source != target else ():
+            transfer(model, provider.pk, source, target, chunk_size)
+        rehomed += 1
+    return rehomed
+
+
+class ShardedQuerySet(models.QuerySet):
+    def create(self, **kwargs):
+        # QuerySet.create saves with using=self.db, which can't see the new
+        # row; let the router pick the shard from the instance instead.
+        if self._db is not None or self._hints:
+            return super().create(**kwargs)
+        obj = self.model(**kwargs)
+        obj.save(force_insert=True)
+        return obj
+
+
+class RegionRouter:
+    """Send sharded models to their provider's shard, everything else to 'default'."""
+
+    def db_for_read(self, model, **hints):
+        if not is_sharded(model):
+            return 'default'
+        instance = hints.get('instance')
+        if instance is None:
+            return None
+        if isinstance(instance, model) and not instance._state.adding and instance._state.db:
+            return instance._state.db
+        if hasattr(instance, 'region'):
+            return shard_for_region(instance.region)
+        provider_id = getattr(instance, 'provider_id', None)
+        return shard_for_provider(provider_id) if provider_id is not None else None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
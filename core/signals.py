@@ -0,0 +1,129 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .listings import refresh_listings, refresh_provider_dates
+from .recommendations import recommendation_cache
+from .models import Availability, Booking, Customer, Service, ServiceCategory, ServiceListing, ServiceProvider, User
+from .sharding import is_enabled, mirror, shard_aliases
+from .tasks import schedule_heatmap_refresh
+
+
+# ---------------------------
+# Service listing read model
+# ---------------------------
+@receiver(post_save, sender=Service)
+def service_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_listings(Service.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=ServiceProvider)
+def provider_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_listings(Service.objects.filter(provider=instance))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Logins only touch last_login; leave the listings (and their cards) alone.
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    if not raw and instance.is_service_provider:
+        ServiceListing.objects.filter(provider__user=instance).update(
+            provider_name=instance.username, updated_at=timezone.now()
+        )
+
+
+@receiver(post_save, sender=ServiceCategory)
+def category_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ServiceListing.objects.filter(category=instance).update(
+            category_name=instance.name, updated_at=timezone.now()
+        )
+
+
+@receiver(post_save, sender=Availability)
+@receiver(post_delete, sender=Availability)
+def availability_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_provider_dates(instance.provider_id)
+
+
+# ---------------------------
+# Recommendation cache
+# ---------------------------
+def provider_categories(provider_id):
+    return set(Service.objects.filter(provider_id=provider_id).values_list('category_id', flat=True))
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def service_changed_recommendations(sender, instance, raw=False, **kwargs):
+    # The previous category of an edited service is unknown, so drop everything.
+    recommendation_cache.clear()
+
+
+@receiver(post_save, sender=ServiceProvider)
+def provider_changed_recommendations(sender, instance, raw=False, **kwargs):
+    if not raw:
+        recommendation_cache.invalidate(category_ids=provider_categories(instance.pk))
+
+
+@receiver(post_save, sender=Availability)
+@receiver(post_delete, sender=Availability)
+def availability_changed_recommendations(sender, instance, raw=False, **kwargs):
+    if not raw:
+        recommendation_cache.invalidate(category_ids=provider_categories(instance.provider_id), date=instance.date)
+
+
+# ---------------------------
+# Heatmap
+# ---------------------------
+@receiver(post_save, sender=Availability)
+@receiver(post_delete, sender=Availability)
+def availability_changed_heatmap(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_heatmap_refresh(provider_categories(instance.provider_id), instance.date)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def booking_changed_heatmap(sender, instance, raw=False, **kwargs):
+    # A booking takes the provider's slot in all of their categories.
+    if not raw:
+        schedule_heatmap_refresh(provider_categories(instance.provider_id), instance.scheduled_date)
+
+
+# ---------------------------
+# Region shards
+# ---------------------------
+# Reference tables are written to 'default' and copied to every shard.
+MIRRORED_MODELS = (User, Customer, ServiceProvider, ServiceCategory, Service)
+
+
+def mirror_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance._state.db != 'default' or not is_enabled():
+        return
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(
+        lambda: [mirror(sender, [instance], alias) for alias in shard_aliases()[1:]], using='default'
+    )
+
+
+def mirror_deleted(sender, instance, **kwargs):
+    # Deleting the copy cascades to the shard's bookings and availability.
+    if instance._state.db != 'default' or not is_enabled():
+        return
+    pk = instance.pk
+    transaction.on_commit(
+        lambda: [sender._base_manager.using(alias).filter(pk=pk).delete() for alias in shard_aliases()[1:]],
+        using='default',
+    )
+
+
+for model in MIRRORED_MODELS:
+    post_save.connect(mirror_saved, sender=model, dispatch_uid=f'mirror_saved_{model.__name__}')
+    post_delete.connect(mirror_deleted, sender=model, dispatch_uid=f'mirror_deleted_{model.__name__}')
@@ -0,0 +1,165 @@
+"""
+A small database-backed task queue.
+
+Functions decorated with :func:`task` can be queued with ``func.enqueue(...)``
+(or :func:`enqueue` by name) and are executed by ``manage.py run_tasks``. It
+needs nothing but the Django database:
+
+* a worker claims due tasks by stamping them with a lock token and a
+  ``locked_until`` deadline (the visibility timeout); a task whose worker died
+  or hung past that deadline counts as a failed attempt;
+* failures are retried with exponential backoff until ``max_attempts`` is
+  reached, after which the task is dead-lettered (status ``dead``) and kept
+  for inspection in the admin.
+
+Task arguments must be JSON serializable.
+"""
+import logging
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_SECONDS = 10
+RETRY_MAX_SECONDS = 60 * 60
+
+_registry = {}
+
+
+class UnknownTask(LookupError):
+    pass
+
+
+def task(func=None, *, name=None, max_attempts=5):
+    """Register ``func`` as a task and give it an ``enqueue`` method."""
+    def register(func):
+        task_name = name or f"{func.__module__}.{func.__qualname__}"
+        _registry[task_name] = func
+        func.task_name = task_name
+        func.max_attempts = max_attempts
+        func.enqueue = lambda *args, **kwargs: enqueue(task_name, *args, **kwargs)
+        return func
+
+    return register(func) if func is not None else register
+
+
+def enqueue(name, *args, run_at=None, max_attempts=None, **kwargs):
+    if name not in _registry:
+        raise UnknownTask(name)
+    return Task.objects.create(
+        name=name,
+        payload={'args': list(args), 'kwargs': kwargs},
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or _registry[name].max_attempts,
+    )
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS))
+
+
+def release_expired(now):
+    """
+    Fail the running tasks whose visibility timeout passed: requeue them with
+    backoff, or dead-letter them once they have used up their attempts. The
+    old lock token is cleared, so a worker still running one can't record an
+    outcome for it.
+    """
+    expired = Task.objects.filter(status='running', locked_until__lt=now)
+    error = "Visibility timeout expired before the task finished."
+    expired.filter(attempts__gte=F('max_attempts')).update(
+        status='dead', locked_until=None, lock_token='', last_error=error, updated_at=now,
+    )
+    for pk, attempts in expired.values_list('pk', 'attempts'):
+        expired.filter(pk=pk).update(
+            status='queued', locked_until=None, lock_token='', last_error=error,
+            run_at=now + retry_delay(attempts), updated_at=now,
+        )
+
+
+def claim(limit, visibility_timeout):
+    """Lock up to ``limit`` due tasks for this worker and return them."""
+    now = timezone.now()
+    due = Q(status='queued', run_at__lte=now)
+    token = uuid.uuid4().hex
+    with transaction.atomic():
+        release_expired(now)
+        pks = list(Task.objects.filter(due).order_by('run_at').values_list('pk', flat=True)[:limit])
+        if not pks:
+            return []
+        Task.objects.filter(due, pk__in=pks).update(
+            status='running',
+            attempts=F('attempts') + 1,
+            locked_until=now + timedelta(seconds=visibility_timeout),
+            lock_token=token,
+        )
+    return list(Task.objects.filter(lock_token=token))
+
+
+def execute(task_id, lock_token):
+    """Run one claimed task and record the outcome. Safe to call from a thread or child process."""
+    close_old_connections()
+    try:
+        task_obj = Task.objects.get(pk=task_id, lock_token=lock_token)
+    except Task.DoesNotExist:
+        # Our lock expired and another worker took the task over.
+        return None
+
+    current = Task.objects.filter(pk=task_id, lock_token=lock_token)
+    try:
+        func = _registry.get(task_obj.name)
+        if func is None:
+            raise UnknownTask(task_obj.name)
+        func(*task_obj.payload.get('args', []), **task_obj.payload.get('kwargs', {}))
+    except Exception:
+        logger.warning("Task %s (%s) failed on attempt %s", task_obj.pk, task_obj.name, task_obj.attempts)
+        error = traceback.format_exc()
+        if task_obj.attempts >= task_obj.max_attempts:
+            outcome = 'dead'
+            current.update(status='dead', locked_until=None, last_error=error, updated_at=timezone.now())
+        else:
+            outcome = 'retry'
+            current.update(
+                status='queued', locked_until=None, last_error=error,
+                run_at=timezone.now() + retry_delay(task_obj.attempts), updated_at=timezone.now(),
+            )
+    else:
+        outcome = 'done'
+        current.update(status='done', locked_until=None, last_error='', updated_at=timezone.now())
+    close_old_connections()
+    return outcome
+
+
+def purgeable(before):
+    return Task.objects.filter(status='done', updated_at__lt=before)
+
+
+def purge_done(before, chunk_size=1000):
+    """
+    Delete tasks that finished before ``before``, at most ``chunk_size`` rows
+    per transaction. Dead tasks are kept for inspection. Returns the number
+    of tasks deleted.
+    """
+    finished = purgeable(before)
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            pks = list(finished.values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                return deleted
+            deleted += Task.objects.filter(pk__in=pks).delete()[0]
+
+
+def requeue_dead(queryset=None):
+    """Give dead-lettered tasks a fresh set of attempts."""
+    queryset = Task.objects.all() if queryset is None else queryset
+    return queryset.filter(status='dead').update(
+        status='queued', attempts=0, run_at=timezone.now(), updated_at=timezone.now()
+    )
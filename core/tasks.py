@@ -0,0 +1,46 @@
+from datetime import date as date_type, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .heatmap import get_config as heatmap_config, refresh_heatmap
+from .lifecycle import CONFIRMED, can_transition, transition
+from .models import Booking, Task
+from .sharding import shard_aliases
+from .taskqueue import task
+
+
+@task(max_attempts=8)
+def mark_booking_paid(reference):
+    """Mark the booking paid and confirm it if it is still pending."""
+    for alias in shard_aliases():
+        for booking in Booking.objects.using(alias).filter(payment_reference=reference, is_paid=False):
+            booking.is_paid = True
+            if can_transition(booking.status, CONFIRMED):
+                transition(booking, CONFIRMED, save=False)
+            booking.save(update_fields=['is_paid', 'status'])
+
+
+@task
+def refresh_heatmap_cells(category_id, date):
+    refresh_heatmap(category_id, date_type.fromisoformat(date))
+
+
+def schedule_heatmap_refresh(category_ids, date):
+    """
+    Queue a heatmap refresh for each category on ``date`` once the current
+    transaction commits. Refreshes are delayed by HEATMAP['REFRESH_DELAY']
+    seconds and a (category, date) that is already queued isn't queued again,
+    so bursts of changes cost one rebuild.
+    """
+    def enqueue():
+        run_at = timezone.now() + timedelta(seconds=heatmap_config()['REFRESH_DELAY'])
+        for category_id in category_ids:
+            args = [category_id, date.isoformat()]
+            queued = Task.objects.filter(
+                name=refresh_heatmap_cells.task_name, status='queued', payload={'args': args, 'kwargs': {}},
+            )
+            if not queued.exists():
+                refresh_heatmap_cells.enqueue(*args, run_at=run_at)
+
+    transaction.on_commit(enqueue)
@@ -1,3 +1,1029 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
+import threading
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import fastrender, heatmap, profiling, taskqueue
+from .archive import archive_availability, archive_bookings
+from .fastrender import FastJSONRenderer, compile_serializer
+from .forms import BookingForm
+from .lifecycle import bulk_transition
+from .middleware import ProfileMiddleware
+from .models import (
+    ArchivedAvailability, ArchivedBooking, Availability, Booking, Customer, HeatmapCell, Service, ServiceCategory,
+    ServiceListing, ServiceProvider, Task, User,
+)
+from .recommendations import (
+    RecommendationCache, load_candidates, recommendation_cache, recommendation_cache_event,
+)
+from .reconciliation import reconcile_payments, save_checkpoint
+from .serializers import AvailabilitySerializer, BookingSerializer, ServiceListingSerializer, ServiceSerializer
+from .sharding import ID_BLOCK, is_enabled, reserve_id_block, shard_aliases, shard_for_provider
+from .tasks import mark_booking_paid, refresh_heatmap_cells, schedule_heatmap_refresh
+from .throttling import TokenBucketThrottle
+
+
+class BookingFixtures:
+    """
+    A 'Cleaning' category, a provider (password 'pw') offering a 'Deep clean'
+    service in it, and a customer. Providers have no coordinates unless given,
+    so with sharding on their rows stay in 'default'.
+    """
+    databases = '__all__'
+
+    def setUp(self):
+        super().setUp()
+        self.category = ServiceCategory.objects.create(name='Cleaning')
+        self.provider_user, self.provider, self.service = self.make_provider('provider')
+        self.customer_user = User.objects.create_user('customer', is_customer=True)
+        self.customer = Customer.objects.create(user=self.customer_user, phone='', name='C', email='c@example.com')
+
+    def make_provider(self, username, location=(None, None), **service_fields):
+        user = User.objects.create_user(username, password='pw', is_service_provider=True)
+        provider = ServiceProvider.objects.create(
+            user=user, phone='', address='', latitude=location[0], longitude=location[1],
+        )
+        service = Service.objects.create(**{
+            'provider': provider, 'category': self.category, 'title': 'Deep clean', 'description': '',
+            'price': 100, 'duration_minutes': 60, **service_fields,
+        })
+        return user, provider, service
+
+    def book(self, service=None, when=None, **fields):
+        return Booking.objects.create(
+            customer=self.customer, service=service or self.service, address='',
+            scheduled_time=when or timezone.now() + timedelta(days=1), **fields
+        )
+
+    def slot(self, date, hour=9, provider=None):
+        return Availability.objects.create(
+            provider=provider or self.provider, date=date, start_time=time(hour), end_time=time(hour + 1),
+        )
+
+
+class FakePaystackHandler(BaseHTTPRequestHandler):
+    # reference -> gateway transaction status, or an int HTTP error code
+    transactions = {}
+    requested = []
+
+    def do_GET(self):
+        reference = self.path.rsplit('/', 1)[-1]
+        self.requested.append(reference)
+        outcome = self.transactions.get(reference)
+        if isinstance(outcome, int):
+            self.send_response(outcome)
+            self.end_headers()
+            return
+        if outcome is None:
+            body = {"status": False, "message": "Transaction reference not found"}
+            self.send_response(400)
+        else:
+            body = {"status": True, "data": {"reference": reference, "status": outcome}}
+            self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(body).encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class ReconcilePaymentsTests(BookingFixtures, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FakePaystackHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.settings_override = override_settings(
+            PAYSTACK_BASE_URL=f"http://127.0.0.1:{cls.server.server_port}"
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        FakePaystackHandler.requested = []
+
+    def book(self, reference, **kwargs):
+        return super().book(payment_reference=reference, **kwargs)
+
+    def test_marks_only_successful_payments_paid(self):
+        FakePaystackHandler.transactions = {'ok-1': 'success', 'ok-2': 'success', 'abandoned': 'abandoned', 'boom': 500}
+        paid = [self.book('ok-1'), self.book('ok-2')]
+        unpaid = [self.book('abandoned'), self.book('boom'), self.book('missing')]
+        self.book(None)
+
+        result = reconcile_payments(batch_size=2, concurrency=3, rate=0)
+
+        self.assertEqual((result.checked, result.paid, result.errors), (5, 2, 2))
+        for booking in paid:
+            booking.refresh_from_db()
+            self.assertTrue(booking.is_paid)
+            self.assertEqual(booking.status, 'confirmed')
+        for booking in unpaid:
+            booking.refresh_from_db()
+            self.assertFalse(booking.is_paid)
+
+    def test_skips_already_paid_bookings(self):
+        FakePaystackHandler.transactions = {'ok-1': 'success'}
+        self.book('ok-1', is_paid=True)
+
+        result = reconcile_payments(rate=0)
+
+        self.assertEqual(result.checked, 0)
+        self.assertEqual(FakePaystackHandler.requested, [])
+
+    def test_resumes_from_checkpoint(self):
+        FakePaystackHandler.transactions = {'ok-1': 'success', 'ok-2': 'success'}
+        first = self.book('ok-1')
+        second = self.book('ok-2')
+        with tempfile.TemporaryDirectory() as tmp:
+            checkpoint = Path(tmp) / 'checkpoint'
+            save_checkpoint(checkpoint, {'default': first.pk})
+
+            result = reconcile_payments(rate=0, checkpoint=checkpoint)
+
+            self.assertFalse(checkpoint.exists())
+        self.assertEqual(FakePaystackHandler.requested, ['ok-2'])
+        self.assertEqual(result.paid, 1)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertFalse(first.is_paid)
+        self.assertTrue(second.is_paid)
+
+
+class ProfileMiddlewareTests(BookingFixtures, TestCase):
+    def test_profiles_resolve_once_per_request(self):
+        request = APIRequestFactory().get('/')
+        request.user = self.provider_user
+
+        def view(request):
+            for _ in range(3):
+                self.assertEqual(request.provider.pk, self.provider.pk)
+            return None
+
+        with self.assertNumQueries(1):
+            ProfileMiddleware(view)(request)
+
+    def test_api_resolves_profile_once_under_jwt(self):
+        self.slot(timezone.localdate())
+        self.slot(timezone.localdate(), hour=10)
+        client = APIClient(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.provider_user)}')
+        # The JWT user, the provider, (with sharding on) its shard, the slots.
+        with self.assertNumQueries(3 + is_enabled()):
+            response = client.get('/api/availability/')
+        self.assertEqual(len(response.json()), 2)
+
+    def test_missing_profile_is_forbidden(self):
+        user = User.objects.create_user('no-profile', password='pw', is_customer=True, is_service_provider=True)
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post('/api/availability/', {
+            'provider': self.provider.pk, 'date': '2030-01-01', 'start_time': '09:00', 'end_time': '10:00',
+        })
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Availability.objects.exists())
+
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(f'/book/{self.service.pk}/').status_code, 403)
+
+
+class FastRenderTests(TestCase):
+    """The compiled list path must render exactly the bytes of the DRF serializers."""
+
+    # The providers are outside every region, so with sharding on all rows
+    # stay in 'default' and the other shards are only read (empty) by gather().
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        tricky = 'Zoë "quoted" \\ back\nslash\t\u2028\u2029\x00\x1f \U0001F9F9 </script>'
+        category = ServiceCategory.objects.create(name=tricky)
+        users = [
+            User.objects.create_user(f'provider-{i}', email=f'p{i}@example.com', is_service_provider=True)
+            for i in range(3)
+        ]
+        providers = [
+            ServiceProvider.objects.create(user=users[0], phone='+234', address=tricky, bio=tricky,
+                                           rating=4.5, latitude=51.5074, longitude=-0.1278),
+            ServiceProvider.objects.create(user=users[1], phone='', address='', rating=0.00001,
+                                           latitude=None, longitude=None),
+            ServiceProvider.objects.create(user=users[2], phone='', address='', rating=1e17,
+                                           latitude=-0.0, longitude=1 / 3),
+        ]
+        services = [
+            Service.objects.create(provider=provider, category=category, title=f'{tricky} {i}',
+                                   description=tricky, price=price, duration_minutes=90, is_available=i != 1)
+            for i, (provider, price) in enumerate(zip(providers, ['0.10', '12345678.90', '7']))
+        ]
+        user = User.objects.create_user('customer', email='c@example.com', is_customer=True)
+        customer = Customer.objects.create(user=user, phone='1', name=tricky, email='c@example.com')
+        for i, service in enumerate(services):
+            Booking.objects.create(
+                customer=customer, service=service, address=tricky, status='confirmed' if i else 'pending',
+                scheduled_time=datetime(2026, 3, 1 + i, 23, 30, 15, 123456 * i, tzinfo=dt_timezone.utc),
+                payment_reference=None if i else 'REF-1', is_paid=bool(i),
+            )
+            Availability.objects.create(provider=service.provider, date=f'2026-03-0{i + 1}',
+                                        start_time=time(9, 0), end_time=time(17, 30, 15))
+        cls.staff = User.objects.create_user('staff', is_staff=True, is_customer=True)
+
+    def assert_same_bytes(self, serializer_class, queryset):
+        expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+        compiled = compile_serializer(serializer_class)
+        self.assertIsNotNone(compiled)
+        self.assertEqual(FastJSONRenderer().render(compiled.convert_queryset(queryset)), expected)
+        with mock.patch.object(fastrender, 'orjson', None):
+            self.assertEqual(FastJSONRenderer().render(compiled.convert_queryset(queryset)), expected)
+
+    def test_serializers_match(self):
+        cases = [
+            (ServiceSerializer, Service.objects.order_by('pk')),
+            (BookingSerializer, Booking.objects.order_by('pk')),
+            (AvailabilitySerializer, Availability.objects.order_by('pk')),
+            (ServiceListingSerializer, ServiceListing.objects.order_by('pk')),
+        ]
+        for serializer_class, queryset in cases:
+            with self.subTest(serializer=serializer_class.__name__):
+                self.assert_same_bytes(serializer_class, queryset)
+        # The shard a provider lives in is internal; keep it out of the fast path too.
+        self.assertNotIn('provider__region', compile_serializer(ServiceSerializer).paths)
+        self.assertNotIn('service__provider__region', compile_serializer(BookingSerializer).paths)
+
+    def test_serializers_match_in_other_timezone(self):
+        with timezone.override('Africa/Lagos'):
+            self.assert_same_bytes(BookingSerializer, Booking.objects.order_by('pk'))
+
+    def test_list_endpoints(self):
+        client = APIClient()
+        client.force_authenticate(self.staff)
+        cases = [
+            ('/api/services/', ServiceSerializer, Service.objects.order_by('pk')),
+            ('/api/bookings/', BookingSerializer, Booking.objects.order_by('pk')),
+        ]
+        for url, serializer_class, queryset in cases:
+            with self.subTest(url=url):
+                response = client.get(url, HTTP_ACCEPT='application/json')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, JSONRenderer().render(serializer_class(queryset, many=True).data))
+
+
+class ListingTests(BookingFixtures, TestCase):
+    def test_login_leaves_listing_alone(self):
+        before = ServiceListing.objects.get(service=self.service).updated_at
+        self.assertTrue(self.client.login(username='provider', password='pw'))
+        self.assertEqual(ServiceListing.objects.get(service=self.service).updated_at, before)
+
+    def test_username_change_updates_listing(self):
+        self.provider_user.username = 'renamed'
+        self.provider_user.save()
+        self.assertEqual(ServiceListing.objects.get(service=self.service).provider_name, 'renamed')
+
+    def test_service_list_paginates_listings(self):
+        for i in range(20):
+            Service.objects.create(
+                provider=self.provider, category=self.category, title=f'Extra {i}', description='', price=10,
+                duration_minutes=60,
+            )
+        response = self.client.get('/services/')
+        self.assertTemplateUsed(response, 'services/service_list.html')
+        self.assertEqual(len(response.context['services']), 20)
+        self.assertContains(response, 'Page 1 of 2')
+        response = self.client.get('/services/?page=2')
+        self.assertEqual([listing.title for listing in response.context['services']], ['Extra 19'])
+
+    def test_service_card_cache_follows_updated_at(self):
+        cache.clear()
+        self.assertContains(self.client.get('/services/'), 'Deep clean')
+        # Same updated_at: the cached card is served.
+        ServiceListing.objects.filter(service=self.service).update(title='Stale')
+        self.assertNotContains(self.client.get('/services/'), 'Stale')
+        self.service.title = 'Spring clean'
+        self.service.save()
+        response = self.client.get('/services/')
+        self.assertContains(response, 'Spring clean')
+        self.assertNotContains(response, 'Deep clean')
+
+    def test_refresh_listing_dates_moves_past_dates_forward(self):
+        today = timezone.localdate()
+        self.slot(today - timedelta(days=1))
+        self.slot(today + timedelta(days=2))
+        ServiceListing.objects.update(next_available_date=today - timedelta(days=1))
+        call_command('refresh_listing_dates', stdout=io.StringIO())
+        self.assertEqual(ServiceListing.objects.get(service=self.service).next_available_date, today + timedelta(days=2))
+
+
+class BookingLifecycleTests(BookingFixtures, TestCase):
+    def statuses(self, bookings):
+        return [Booking.objects.get(pk=booking.pk).status for booking in bookings]
+
+    def test_bulk_transition_moves_only_legal_sources(self):
+        bookings = [self.book(status=status) for status in ('pending', 'confirmed', 'cancelled', 'pending')]
+        moved = bulk_transition(Booking.objects.all(), 'cancelled', chunk_size=1)
+        self.assertEqual(moved, 3)
+        self.assertEqual(self.statuses(bookings), ['cancelled'] * 4)
+        self.assertEqual(bulk_transition(Booking.objects.all(), 'confirmed'), 0)
+
+    def test_expire_bookings(self):
+        now = timezone.now()
+        stale = self.book()
+        paid = self.book(is_paid=True)
+        fresh = self.book()
+        past = self.book(status='confirmed', when=now - timedelta(hours=1))
+        upcoming = self.book(status='confirmed')
+        Booking.objects.filter(pk__in=[stale.pk, paid.pk]).update(created_at=now - timedelta(minutes=31))
+
+        out = io.StringIO()
+        call_command('expire_bookings', ttl_minutes=30, stdout=out)
+
+        self.assertIn("Expired 1 pending bookings, completed 1 confirmed bookings.", out.getvalue())
+        self.assertEqual(
+            self.statuses([stale, paid, fresh, past, upcoming]),
+            ['expired', 'pending', 'pending', 'completed', 'confirmed'],
+        )
+
+    def test_new_bookings_start_pending(self):
+        serializer = BookingSerializer(data={'status': 'confirmed'})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('status', serializer.errors)
+        form = BookingForm(data={
+            'customer': self.customer.pk, 'service': self.service.pk, 'status': 'completed',
+            'scheduled_time': '2030-01-01 10:00', 'address': 'x',
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('status', form.errors)
+
+    def test_customers_may_only_cancel(self):
+        booking = self.book()
+        client = APIClient()
+        client.force_authenticate(self.customer_user)
+        url = f'/api/bookings/{booking.pk}/'
+        response = client.patch(url, {'status': 'confirmed'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('status', response.json())
+        client.patch(url, {'is_paid': True}, format='json')
+        response = client.patch(url, {'status': 'cancelled'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        booking.refresh_from_db()
+        self.assertEqual((booking.status, booking.is_paid), ('cancelled', False))
+
+    def test_payment_confirms_pending_bookings(self):
+        pending = self.book(payment_reference='ref-1')
+        cancelled = self.book(payment_reference='ref-2', status='cancelled')
+        mark_booking_paid('ref-1')
+        mark_booking_paid('ref-2')
+        pending.refresh_from_db()
+        cancelled.refresh_from_db()
+        self.assertEqual((pending.status, pending.is_paid), ('confirmed', True))
+        self.assertEqual((cancelled.status, cancelled.is_paid), ('cancelled', True))
+
+    def test_api_create_refuses_a_taken_slot(self):
+        client = APIClient()
+        client.force_authenticate(self.customer_user)
+        data = {'service_id': self.service.pk, 'scheduled_time': '2030-01-07T10:00:00Z', 'address': 'x'}
+        response = client.post('/api/bookings/', data, format='json')
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body['service']['id'], body['customer']['id'], body['status']), (
+            self.service.pk, self.customer.pk, 'pending',
+        ))
+        self.assertNotIn('region', body['service']['provider'])
+
+        response = client.post('/api/bookings/', data, format='json')
+        self.assertEqual(response.status_code, 400)
+        Booking.objects.update(status='cancelled')
+        self.assertEqual(client.post('/api/bookings/', data, format='json').status_code, 201)
+
+    def test_calendar_counts_add_up(self):
+        day = timezone.make_aware(datetime(2030, 1, 7, 12))
+        for status in ('pending', 'confirmed', 'completed', 'cancelled', 'expired'):
+            self.book(status=status, when=day)
+        client = APIClient()
+        client.force_authenticate(self.provider_user)
+        response = client.get('/api/provider/calendar/', {'start': '2030-01-07', 'end': '2030-01-07'})
+        [bucket] = response.json()['buckets']
+        self.assertEqual(bucket['expired'], 1)
+        self.assertEqual(bucket['total'], sum(bucket[status] for status in (
+            'pending', 'confirmed', 'completed', 'cancelled', 'expired',
+        )))
+
+
+@taskqueue.task(name='tests.fail')
+def failing_task():
+    raise RuntimeError("boom")
+
+
+class TaskQueueTests(TestCase):
+    def run_once(self):
+        [claimed] = taskqueue.claim(1, 300)
+        with self.assertLogs('core.taskqueue', 'WARNING'):
+            outcome = taskqueue.execute(claimed.pk, claimed.lock_token)
+        return outcome, Task.objects.get(pk=claimed.pk)
+
+    def test_failures_retry_with_backoff_then_dead_letter(self):
+        failing_task.enqueue(max_attempts=3)
+        delays = []
+        for expected in ('retry', 'retry', 'dead'):
+            before = timezone.now()
+            outcome, task_obj = self.run_once()
+            self.assertEqual(outcome, expected)
+            self.assertIn('RuntimeError: boom', task_obj.last_error)
+            delays.append(task_obj.run_at - before)
+            Task.objects.filter(pk=task_obj.pk).update(run_at=timezone.now())
+        self.assertEqual((task_obj.status, task_obj.attempts), ('dead', 3))
+        self.assertAlmostEqual(delays[0].total_seconds(), taskqueue.RETRY_BASE_SECONDS, delta=2)
+        self.assertAlmostEqual(delays[1].total_seconds(), 2 * taskqueue.RETRY_BASE_SECONDS, delta=2)
+        self.assertEqual(taskqueue.claim(1, 300), [])
+
+    def test_expired_lock_counts_as_failed_attempt(self):
+        task_obj = failing_task.enqueue(max_attempts=2)
+        [first] = taskqueue.claim(1, 300)
+        Task.objects.filter(pk=task_obj.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(taskqueue.claim(1, 300), [])
+        task_obj.refresh_from_db()
+        self.assertEqual((task_obj.status, task_obj.attempts, task_obj.lock_token), ('queued', 1, ''))
+        self.assertGreater(task_obj.run_at, timezone.now())
+        # The worker that lost the lock can no longer record an outcome.
+        self.assertIsNone(taskqueue.execute(first.pk, first.lock_token))
+
+        Task.objects.filter(pk=task_obj.pk).update(run_at=timezone.now())
+        [second] = taskqueue.claim(1, 300)
+        Task.objects.filter(pk=task_obj.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(taskqueue.claim(1, 300), [])
+        task_obj.refresh_from_db()
+        self.assertEqual((task_obj.status, task_obj.attempts), ('dead', 2))
+        self.assertIn('Visibility timeout', task_obj.last_error)
+
+
+class RunTasksTests(TestCase):
+    def test_slow_task_does_not_hold_back_other_slots(self):
+        # With two slots, "slow" can only finish if "release" is claimed while
+        # it still runs, i.e. as soon as "quick" frees the other slot.
+        queue = ['slow', 'quick', 'release']
+        released = threading.Event()
+        outcomes = []
+
+        def claim(limit, visibility_timeout):
+            claimed = [mock.Mock(pk=name, lock_token='') for name in queue[:limit]]
+            del queue[:limit]
+            return claimed
+
+        def execute(name, lock_token):
+            if name == 'slow' and not released.wait(5):
+                raise TimeoutError(name)
+            outcomes.append(name)
+            if name == 'release':
+                released.set()
+
+        out = io.StringIO()
+        with mock.patch.object(taskqueue, 'claim', claim), mock.patch.object(taskqueue, 'execute', execute):
+            call_command('run_tasks', concurrency=2, once=True, poll_interval=0.05, stdout=out)
+
+        self.assertEqual(outcomes, ['quick', 'release', 'slow'])
+        self.assertIn("Processed 3 tasks.", out.getvalue())
+
+
+class ThrottleView:
+    throttle_scope = 'test'
+
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'test': '2/min', 'register': '2/min'}})
+class ThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def request(self, **headers):
+        request = Request(APIRequestFactory().get('/', REMOTE_ADDR='10.0.0.1', **headers))
+        request.user = AnonymousUser()
+        return request
+
+    def allow(self, request, now):
+        throttle = TokenBucketThrottle()
+        throttle.timer = lambda: now
+        return throttle.allow_request(request, ThrottleView()), throttle.wait()
+
+    def test_endpoint_returns_429_with_retry_after(self):
+        client = APIClient()
+        for _ in range(2):
+            self.assertEqual(client.post('/api/register/customer/', {}).status_code, 400)
+        response = client.post('/api/register/customer/', {})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn(int(response['Retry-After']), (30, 31))
+
+    def test_bucket_refills_at_the_steady_rate(self):
+        request = self.request()
+        self.assertEqual([self.allow(request, 1000)[0] for _ in range(3)], [True, True, False])
+        self.assertEqual(self.allow(request, 1000)[1], 30)
+        self.assertEqual(self.allow(request, 1015), (False, 15))
+        self.assertEqual(self.allow(request, 1030)[0], True)
+        self.assertEqual(self.allow(request, 1030)[0], False)
+
+    def test_forwarded_for_is_keyed_on_the_proxy_entry(self):
+        for spoofed in ('1.1.1.1', '2.2.2.2', '3.3.3.3'):
+            allowed, _ = self.allow(self.request(HTTP_X_FORWARDED_FOR=f'{spoofed}, 198.51.100.7'), 1000)
+        self.assertFalse(allowed)
+        self.assertTrue(self.allow(self.request(HTTP_X_FORWARDED_FOR='198.51.100.8'), 1000)[0])
+
+    def test_parallel_requests_spend_each_token_once(self):
+        request = self.request()
+        barrier = threading.Barrier(10)
+        results = []
+        load_bucket = TokenBucketThrottle.load_bucket
+
+        def slow_load(throttle, key):
+            # Widen the gap between reading and writing the bucket.
+            bucket = load_bucket(throttle, key)
+            threading.Event().wait(0.005)
+            return bucket
+
+        def hit():
+            barrier.wait()
+            results.append(self.allow(request, 1000)[0])
+
+        threads = [threading.Thread(target=hit) for _ in range(10)]
+        with mock.patch.object(TokenBucketThrottle, 'load_bucket', slow_load):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(results.count(True), 2)
+
+
+class RecommendationCacheTests(BookingFixtures, TestCase):
+    # Outside every region, so with sharding on all rows stay in 'default'.
+    PARIS = (48.8566, 2.3522)
+
+    def setUp(self):
+        super().setUp()
+        self.date = timezone.localdate() + timedelta(days=1)
+        _, self.near, _ = self.make_provider('near', self.PARIS)
+        self.slot(self.date, provider=self.near)
+        self.cache = RecommendationCache(cell_degrees=0.01, ttl=60, max_entries=2)
+        self.events = []
+        recommendation_cache_event.connect(self.record)
+        self.addCleanup(recommendation_cache_event.disconnect, self.record)
+
+    def record(self, sender, event, **kwargs):
+        self.events.append(event)
+
+    def lookup(self, lat=PARIS[0], lng=PARIS[1], date=None):
+        return self.cache.get_or_build(self.category.pk, date or self.date, lat, lng)
+
+    def test_nearby_lookups_share_an_entry_but_rank_from_their_own_location(self):
+        [first] = self.lookup()
+        with self.assertNumQueries(0):
+            [second] = self.lookup(self.PARIS[0] + 0.004, self.PARIS[1])
+        self.assertEqual(first['service_id'], second['service_id'])
+        self.assertEqual(first['distance_km'], 0)
+        self.assertAlmostEqual(second['distance_km'], 0.44, places=2)
+        self.assertEqual(self.events, ['miss', 'hit'])
+        self.assertEqual(self.cache.stats(), {'hits': 1, 'misses': 1, 'hit_rate': 0.5, 'entries': 1})
+
+    def test_least_recently_used_entry_is_evicted(self):
+        other_date = self.date + timedelta(days=1)
+        self.lookup()
+        self.lookup(date=other_date)
+        self.lookup()
+        self.lookup(self.PARIS[0] + 1, self.PARIS[1])
+        self.assertEqual(self.cache.stats()['entries'], 2)
+        self.lookup()
+        self.lookup(date=other_date)
+        self.assertEqual(self.events, ['miss', 'miss', 'hit', 'miss', 'hit', 'miss'])
+
+    def test_entries_expire(self):
+        with mock.patch('core.recommendations.time.monotonic', return_value=1000):
+            self.lookup()
+        with mock.patch('core.recommendations.time.monotonic', return_value=1059):
+            self.lookup()
+        with mock.patch('core.recommendations.time.monotonic', return_value=1061):
+            self.lookup()
+        self.assertEqual(self.events, ['miss', 'hit', 'miss'])
+
+    def test_model_saves_invalidate(self):
+        self.cache = recommendation_cache
+        self.cache.clear()
+        for save in (
+            lambda: self.slot(self.date, hour=10, provider=self.near),
+            lambda: self.near.save(),
+            lambda: self.service.save(),
+        ):
+            self.lookup()
+            self.assertEqual(self.cache.stats()['entries'], 1)
+            save()
+            self.assertEqual(self.cache.stats()['entries'], 0)
+
+    def test_build_overlapping_an_invalidation_is_not_stored(self):
+        def load(category_id, date):
+            self.cache.invalidate()
+            return load_candidates(category_id, date)
+
+        with mock.patch('core.recommendations.load_candidates', side_effect=load):
+            self.assertEqual(len(self.lookup()), 1)
+        self.assertEqual(self.cache.stats()['entries'], 0)
+        self.assertEqual(self.events, ['miss', 'invalidate'])
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = Path(tmp.name)
+        self.config = {'ENABLED': True, 'DIR': self.directory, 'SLOW_REQUEST_MS': None}
+        self.staff = User.objects.create_user('staff', is_staff=True)
+        self.user = User.objects.create_user('user')
+
+    def get(self, user=None, **headers):
+        if user is not None:
+            headers['HTTP_AUTHORIZATION'] = f'Bearer {AccessToken.for_user(user)}'
+        with self.settings(PROFILING=self.config):
+            return APIClient().get('/api/services/', **headers)
+
+    def captures(self):
+        return profiling.list_profiles(self.directory)
+
+    def test_header_from_jwt_staff_user_captures(self):
+        self.assertEqual(self.get(self.staff, HTTP_X_PROFILE='1').status_code, 200)
+        [capture] = self.captures()
+        self.assertEqual((capture['trigger'], capture['has_cprofile']), ('requested', True))
+        self.assertTrue((self.directory / f"{capture['name']}.prof").is_file())
+        self.assertTrue((self.directory / f"{capture['name']}.folded").is_file())
+
+    def test_header_from_other_users_is_ignored(self):
+        self.get(self.user, HTTP_X_PROFILE='1')
+        self.get(HTTP_X_PROFILE='1')
+        self.assertEqual(self.captures(), [])
+
+    def test_only_verified_staff_tokens_run_cprofile(self):
+        with mock.patch('core.profiling.cProfile.Profile') as profile:
+            self.get(self.user, HTTP_X_PROFILE='1')
+            self.get(HTTP_X_PROFILE='1', HTTP_AUTHORIZATION='Bearer not-a-token')
+            profile.assert_not_called()
+
+    def test_token_header_captures_anonymous_request(self):
+        self.config['TOKEN'] = 'secret'
+        self.get(HTTP_X_PROFILE='wrong')
+        self.get(self.staff, HTTP_X_PROFILE='wrong')
+        self.assertEqual(self.captures(), [])
+        self.get(HTTP_X_PROFILE='secret')
+        self.assertEqual(len(self.captures()), 1)
+
+    def test_rotation_keeps_newest_captures(self):
+        self.config['MAX_PROFILES'] = 2
+        for _ in range(3):
+            self.get(self.staff, HTTP_X_PROFILE='1')
+        names = sorted(path.name for path in self.directory.iterdir())
+        self.assertEqual(len(names), 6)
+        self.assertEqual({name.rsplit('.', 1)[0] for name in names}, {c['name'] for c in self.captures()})
+
+    def test_download_validates_name_and_kind(self):
+        self.get(self.staff, HTTP_X_PROFILE='1')
+        [capture] = self.captures()
+        self.client.force_login(self.staff)
+        with self.settings(PROFILING=self.config):
+            self.assertEqual(self.client.get(f"/profiling/{capture['name']}.folded").status_code, 200)
+            for url in (f"/profiling/{capture['name']}.py", '/profiling/missing.json', '/profiling/..%2Fdb.json'):
+                with self.subTest(url=url):
+                    self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertIsNone(profiling.profile_path('../db', '.json', self.directory))
+        self.assertIsNone(profiling.profile_path('a b', '.json', self.directory))
+
+
+class ArchiveTests(BookingFixtures, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.old = timezone.now() - timedelta(days=200)
+
+    def test_archive_moves_only_old_finished_rows(self):
+        old_done = [self.book(status=status, when=self.old) for status in ('completed', 'cancelled', 'expired')]
+        old_confirmed = self.book(status='confirmed', when=self.old)
+        recent = self.book(status='completed', when=timezone.now() - timedelta(days=1))
+        today = timezone.localdate()
+        old_slot, new_slot = self.slot(today - timedelta(days=10)), self.slot(today)
+
+        self.assertEqual(archive_bookings(days=180, chunk_size=2), 3)
+        self.assertEqual(archive_availability(days=7), 1)
+
+        self.assertEqual(set(Booking.objects.values_list('pk', flat=True)), {old_confirmed.pk, recent.pk})
+        archived = ArchivedBooking.objects.order_by('pk')
+        self.assertEqual([b.pk for b in archived], [b.pk for b in old_done])
+        self.assertEqual([b.status for b in archived], ['completed', 'cancelled', 'expired'])
+        self.assertTrue(all(b.archived_at for b in archived))
+        self.assertEqual(list(Availability.objects.values_list('pk', flat=True)), [new_slot.pk])
+        self.assertEqual(list(ArchivedAvailability.objects.values_list('pk', flat=True)), [old_slot.pk])
+
+    def test_include_archived_merges_by_id(self):
+        first = self.book(status='completed', when=self.old)
+        second = self.book(status='confirmed', when=self.old)
+        third = self.book(status='completed', when=self.old)
+        self.slot(timezone.localdate() - timedelta(days=10))
+        self.slot(timezone.localdate())
+        archive_bookings(days=180)
+        archive_availability(days=7)
+
+        client = APIClient()
+        client.force_authenticate(self.customer_user)
+        ids = [row['id'] for row in client.get('/api/bookings/').json()]
+        self.assertEqual(ids, [second.pk])
+        ids = [row['id'] for row in client.get('/api/bookings/', {'include_archived': '1'}).json()]
+        self.assertEqual(ids, [first.pk, second.pk, third.pk])
+
+        client.force_authenticate(self.provider_user)
+        self.assertEqual(len(client.get('/api/availability/').json()), 1)
+        self.assertEqual(len(client.get('/api/availability/', {'include_archived': 'true'}).json()), 2)
+
+    def test_archive_data_purges_old_finished_tasks(self):
+        old = timezone.now() - timedelta(days=8)
+        done, dead, recent = (failing_task.enqueue() for _ in range(3))
+        Task.objects.filter(pk__in=[done.pk, dead.pk]).update(updated_at=old)
+        Task.objects.filter(pk__in=[done.pk, recent.pk]).update(status='done')
+        Task.objects.filter(pk=dead.pk).update(status='dead')
+        out = io.StringIO()
+        call_command('archive_data', chunk_size=1, stdout=out)
+        self.assertIn("deleted 1 finished tasks", out.getvalue())
+        self.assertEqual(set(Task.objects.values_list('pk', flat=True)), {dead.pk, recent.pk})
+
+    def test_calendar_sums_live_and_archived_counts(self):
+        self.book(status='completed', when=self.old)
+        self.book(status='confirmed', when=self.old)
+        archive_bookings(days=180)
+        client = APIClient()
+        client.force_authenticate(self.provider_user)
+        day = timezone.localtime(self.old).date().isoformat()
+        params = {'start': day, 'end': day}
+
+        [live] = client.get('/api/provider/calendar/', params).json()['buckets']
+        self.assertEqual((live['total'], live['confirmed'], live['completed']), (1, 1, 0))
+        [merged] = client.get('/api/provider/calendar/', {**params, 'include_archived': '1'}).json()['buckets']
+        self.assertEqual((merged['total'], merged['confirmed'], merged['completed']), (2, 1, 1))
+
+
+class HeatmapTests(BookingFixtures, TestCase):
+    # Outside every region, so the rows stay in 'default' with sharding on.
+    PARIS = (48.8566, 2.3522)
+    PARIS_NEARBY = (48.8570, 2.3530)
+    MADRID = (40.4168, -3.7038)
+
+    def setUp(self):
+        super().setUp()
+        self.other_category = ServiceCategory.objects.create(name='Laundry')
+        self.date = timezone.localdate() + timedelta(days=3)
+
+    def at(self, hour):
+        return timezone.make_aware(datetime.combine(self.date, time(hour, 30)))
+
+    def test_build_cells_aggregates_per_precision(self):
+        _, a, a_service = self.make_provider('a', self.PARIS)
+        _, b, _ = self.make_provider('b', self.PARIS_NEARBY)
+        _, _, c_service = self.make_provider('c', self.MADRID, is_available=False)
+        a_other = Service.objects.create(
+            provider=a, category=self.other_category, title='a laundry', description='', price=10, duration_minutes=60,
+        )
+        self.slot(self.date, 9, a)
+        self.slot(self.date, 10, a)
+        self.slot(self.date, 9, b)
+        self.book(a_service, self.at(9))
+        # Takes a's 10:00 slot but is demand for the other category.
+        self.book(a_other, self.at(10))
+        self.book(c_service, self.at(9))
+
+        cells = {
+            cell.geohash: (cell.precision, cell.providers, cell.open_slots, cell.bookings)
+            for cell in heatmap.build_cells(self.category.pk, self.date, (4, 5))
+        }
+
+        paris = heatmap.encode(*self.PARIS, 5)
+        self.assertEqual(heatmap.encode(*self.PARIS_NEARBY, 5), paris)
+        madrid = heatmap.encode(*self.MADRID, 5)
+        self.assertEqual(cells, {
+            paris[:4]: (4, 2, 1, 1),
+            paris: (5, 2, 1, 1),
+            madrid[:4]: (4, 0, 0, 1),
+            madrid: (5, 0, 0, 1),
+        })
+
+    def cell(self, geohash):
+        latitude, longitude = heatmap.decode(geohash)
+        return HeatmapCell.objects.create(
+            category=self.category, date=self.date, geohash=geohash, precision=len(geohash),
+            latitude=latitude, longitude=longitude, providers=1,
+        )
+
+    def test_bbox_includes_cells_whose_centre_is_outside(self):
+        geohash = heatmap.encode(*self.PARIS, 5)
+        self.cell(geohash)
+        latitude, longitude = heatmap.decode(geohash)
+        height, width = heatmap.cell_size(5)
+        self.cell(heatmap.encode(latitude + 2 * height, longitude, 5))
+
+        # A corner of the cell that doesn't contain its centre.
+        bbox = (longitude + width * 0.3, latitude + height * 0.3, longitude + width * 0.45, latitude + height * 0.45)
+        rows = heatmap.cells_in_bbox(self.category.pk, self.date, 5, bbox)
+        self.assertEqual([row[0] for row in rows], [geohash])
+
+    def test_too_many_cells_returns_none(self):
+        geohash = heatmap.encode(*self.PARIS, 5)
+        latitude, longitude = heatmap.decode(geohash)
+        height, width = heatmap.cell_size(5)
+        self.cell(geohash)
+        self.cell(heatmap.encode(latitude, longitude + width, 5))
+        bbox = (longitude - width, latitude - height, longitude + 2 * width, latitude + height)
+        self.assertEqual(len(heatmap.cells_in_bbox(self.category.pk, self.date, 5, bbox)), 2)
+        with self.settings(HEATMAP={**settings.HEATMAP, 'MAX_CELLS': 1}):
+            self.assertIsNone(heatmap.cells_in_bbox(self.category.pk, self.date, 5, bbox))
+
+    def test_view_validates_parameters(self):
+        geohash = heatmap.encode(*self.PARIS, 5)
+        self.cell(geohash)
+        self.cell(heatmap.encode(*self.PARIS, 4))
+        latitude, longitude = heatmap.decode(geohash)
+        client = APIClient()
+        client.force_authenticate(self.customer_user)
+        params = {
+            'category': self.category.pk, 'date': self.date.isoformat(),
+            'bbox': f'{longitude - 1},{latitude - 1},{longitude + 1},{latitude + 1}',
+        }
+        for bad in ({'category': ''}, {'date': 'tomorrow'}, {'bbox': '1,2,3'}, {'bbox': 'a,b,c,d'}, {'precision': 7}):
+            with self.subTest(bad=bad):
+                self.assertEqual(client.get('/api/heatmap/', {**params, **bad}).status_code, 400)
+
+        body = client.get('/api/heatmap/', params).json()
+        self.assertEqual((body['precision'], body['fields']), (5, heatmap.FIELDS))
+        self.assertEqual([row[0] for row in body['cells']], [geohash])
+        self.assertEqual(len(client.get('/api/heatmap/', {**params, 'precision': 4}).json()['cells']), 1)
+        with self.settings(HEATMAP={**settings.HEATMAP, 'MAX_CELLS': 0}):
+            response = client.get('/api/heatmap/', params)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Too many cells', response.json()['error'])
+
+    def test_refresh_is_queued_once_per_category_and_date(self):
+        queued = Task.objects.filter(name=refresh_heatmap_cells.task_name)
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule_heatmap_refresh([self.category.pk], self.date)
+            schedule_heatmap_refresh([self.category.pk], self.date)
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule_heatmap_refresh([self.category.pk, self.other_category.pk], self.date)
+        self.assertEqual(queued.count(), 2)
+        self.assertGreater(queued.first().run_at, timezone.now() + timedelta(seconds=20))
+
+        queued.update(status='done')
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule_heatmap_refresh([self.category.pk], self.date)
+        self.assertEqual(queued.filter(status='queued').count(), 1)
+
+
+@skipUnless(is_enabled(), "run with CLEANBASE_SHARDING=1 to test region shards")
+class ShardingTests(TransactionTestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        for alias in shard_aliases()[1:]:
+            reserve_id_block(alias, Booking)
+            reserve_id_block(alias, Availability)
+        category = ServiceCategory.objects.create(name='Cleaning')
+        self.providers = {}
+        for region, (min_lat, min_lng, max_lat, max_lng) in [('', (0, 0, 0, 0)), *settings.REGIONS.items()]:
+            user = User.objects.create_user(f'provider-{region or "default"}', is_service_provider=True)
+            provider = ServiceProvider.objects.create(
+                user=user, phone='', address='',
+                latitude=(min_lat + max_lat) / 2, longitude=(min_lng + max_lng) / 2,
+            )
+            service = Service.objects.create(
+                provider=provider, category=category, title=region, description='', price=100, duration_minutes=60,
+            )
+            self.providers[region] = (user, provider, service)
+        self.customer_user = User.objects.create_user('customer', is_customer=True)
+        self.customer = Customer.objects.create(user=self.customer_user, phone='', name='c', email='c@example.com')
+        self.when = timezone.now() + timedelta(days=1)
+        for user, provider, service in self.providers.values():
+            Booking.objects.create(customer=self.customer, service=service, scheduled_time=self.when, address='x')
+            Availability.objects.create(provider=provider, date=self.when.date(), start_time=time(9), end_time=time(10))
+
+    def test_rows_live_in_their_region(self):
+        for region, (user, provider, service) in self.providers.items():
+            alias = region or 'default'
+            self.assertEqual(provider.region, region)
+            booking = Booking.objects.using(alias).get(provider=provider)
+            self.assertEqual(booking.pk // ID_BLOCK, shard_aliases().index(alias))
+            self.assertTrue(Availability.objects.using(alias).filter(provider=provider).exists())
+
+    def test_bookings_api_gathers_and_locates_across_shards(self):
+        client = APIClient()
+        client.force_authenticate(self.customer_user)
+        rows = client.get('/api/bookings/').json()
+        self.assertEqual(len(rows), len(self.providers))
+        self.assertEqual([row['id'] for row in rows], sorted(row['id'] for row in rows))
+        booking_id = rows[-1]['id']
+        response = client.patch(f'/api/bookings/{booking_id}/', {'status': 'cancelled'}, format='json')
+        self.assertEqual(response.json()['status'], 'cancelled')
+        self.assertEqual(Booking.objects.using(shard_aliases()[-1]).get(pk=booking_id).status, 'cancelled')
+
+    def test_booking_create_checks_the_provider_shard(self):
+        region = shard_aliases()[-1]
+        _, provider, service = self.providers[region]
+        client = APIClient()
+        client.force_authenticate(self.customer_user)
+        data = {'service_id': service.pk, 'scheduled_time': self.when.isoformat(), 'address': 'x'}
+        self.assertEqual(client.post('/api/bookings/', data, format='json').status_code, 400)
+        data['scheduled_time'] = (self.when + timedelta(hours=1)).isoformat()
+        response = client.post('/api/bookings/', data, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Booking.objects.using(region).filter(pk=response.json()['id']).exists())
+        self.assertNotIn('region', client.get(f'/api/providers/{provider.pk}/').json())
+
+    def move_to_region(self, provider):
+        region, (min_lat, min_lng, max_lat, max_lng) = next(iter(settings.REGIONS.items()))
+        provider.latitude, provider.longitude = (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+        provider.save()
+        call_command('sync_shards', skip_migrate=True, stdout=io.StringIO())
+        return region
+
+    def test_region_stays_pinned_until_sync_shards_moves_the_rows(self):
+        user, provider, service = self.providers['']
+        region, (min_lat, min_lng, max_lat, max_lng) = next(iter(settings.REGIONS.items()))
+        provider.latitude, provider.longitude = (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+        provider.save()
+        self.assertEqual(ServiceProvider.objects.get(pk=provider.pk).region, '')
+        self.assertEqual(shard_for_provider(provider.pk), 'default')
+        self.assertTrue(Booking.objects.using('default').filter(provider=provider).exists())
+
+        out = io.StringIO()
+        call_command('sync_shards', skip_migrate=True, stdout=out)
+        self.assertIn("moved 1 providers to a new region", out.getvalue())
+        self.assertEqual(ServiceProvider.objects.get(pk=provider.pk).region, region)
+        self.assertEqual(ServiceProvider.objects.using(region).get(pk=provider.pk).region, region)
+        self.assertEqual(shard_for_provider(provider.pk), region)
+        self.assertFalse(Booking.objects.using('default').filter(provider=provider).exists())
+        self.assertTrue(Booking.objects.using(region).filter(provider=provider).exists())
+        self.assertTrue(Availability.objects.using(region).filter(provider=provider).exists())
+
+
+    def test_sync_shards_migrates_a_new_shard_next_to_existing_data(self):
+        region = shard_aliases()[-1]
+        call_command('migrate', 'core', '0002', database=region, verbosity=0)
+        call_command('sync_shards', stdout=io.StringIO())
+        self.assertEqual(ServiceListing.objects.using('default').count(), len(self.providers))
+        self.assertEqual(
+            set(Service.objects.using(region).values_list('pk', flat=True)),
+            set(Service.objects.using('default').values_list('pk', flat=True)),
+        )
+        self.assertTrue(Booking.objects.using(region).filter(provider=self.providers[region][1]).exists())
+
+    def test_reconcile_payments_checks_rows_moved_between_shards(self):
+        # A default-shard booking with a higher id than the one that moves away.
+        user = User.objects.create_user('provider-stays', is_service_provider=True)
+        provider = ServiceProvider.objects.create(user=user, phone='', address='')
+        service = Service.objects.create(
+            provider=provider, category=self.providers[''][2].category, title='stays', description='', price=1,
+            duration_minutes=60,
+        )
+        Booking.objects.create(customer=self.customer, service=service, scheduled_time=self.when, address='x')
+        self.move_to_region(self.providers[''][1])
+        for alias in shard_aliases():
+            Booking.objects.using(alias).update(payment_reference=F('id'))
+
+        async def verify_references(client, references, concurrency, limiter):
+            return {reference: 'success' for reference in references}
+
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch('core.reconciliation.verify_references', verify_references):
+            result = reconcile_payments(batch_size=1, rate=0, checkpoint=Path(tmp) / 'checkpoint')
+        self.assertEqual(result.paid, len(self.providers) + 1)
+        for alias in shard_aliases():
+            self.assertFalse(Booking.objects.using(alias).filter(is_paid=False).exists())
+
+    def test_duplicate_availability_in_a_shard_is_rejected(self):
+        region = shard_aliases()[-1]
+        user, provider, service = self.providers[region]
+        client = APIClient()
+        client.force_authenticate(user)
+        slot = {'provider': provider.pk, 'date': self.when.date().isoformat(), 'start_time': '09:00', 'end_time': '10:00'}
+        response = client.post('/api/availability/', slot, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('non_field_errors', response.json())
+        response = client.post('/api/availability/', {**slot, 'start_time': '11:00', 'end_time': '12:00'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Availability.objects.using(region).filter(pk=response.json()['id']).exists())
@@ -0,0 +1,116 @@
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import RLock
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Token-bucket throttle keyed on scope and user, or client IP for anonymous requests.
+
+    The scope is taken from the view's ``throttle_scope`` or else the class
+    ``scope``, and its rate from ``DEFAULT_THROTTLE_RATES``. A rate of
+    ``'N/period'`` is a bucket of N tokens refilled evenly over the period, so
+    clients may burst up to N requests and then proceed at the steady rate.
+
+    Buckets live in the Django cache and each read-modify-write of a bucket
+    holds a short lock taken with ``cache.add``, so parallel requests can't
+    spend the same token. If the cache backend errors, buckets fall back to a
+    bounded in-process store so a cache outage doesn't take the endpoints down
+    with it.
+    """
+    cache_format = 'token_bucket_%(scope)s_%(ident)s'
+    max_local_buckets = 10000
+    local_buckets = OrderedDict()
+    local_lock = RLock()
+    # Seconds a bucket lock lives (in case its holder dies) and how long a
+    # request waits for it before going ahead unlocked.
+    lock_timeout = 1
+    lock_wait = 0.1
+
+    def __init__(self):
+        # The rate depends on the view, so it is resolved in allow_request().
+        self.wait_seconds = None
+
+    def get_rate(self):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, 'throttle_scope', None) or self.scope
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+
+        self.key = self.get_cache_key(request, view)
+        with self.lock_bucket(self.key):
+            now = self.timer()
+            refill = self.num_requests / self.duration
+            tokens, last = self.load_bucket(self.key) or (self.num_requests, now)
+            tokens = min(self.num_requests, tokens + (now - last) * refill)
+
+            if tokens >= 1:
+                self.store_bucket(self.key, (tokens - 1, now))
+                return True
+            self.store_bucket(self.key, (tokens, now))
+        self.wait_seconds = (1 - tokens) / refill
+        return False
+
+    def wait(self):
+        return self.wait_seconds
+
+    @contextmanager
+    def lock_bucket(self, key):
+        lock_key = f'{key}_lock'
+        try:
+            deadline = time.monotonic() + self.lock_wait
+            while not (acquired := self.cache.add(lock_key, 1, self.lock_timeout)):
+                if time.monotonic() > deadline:
+                    break
+                time.sleep(0.001)
+        except Exception:
+            with self.local_lock:
+                yield
+            return
+        try:
+            yield
+        finally:
+            if acquired:
+                try:
+                    self.cache.delete(lock_key)
+                except Exception:
+                    pass
+
+    def load_bucket(self, key):
+        try:
+            return self.cache.get(key)
+        except Exception:
+            with self.local_lock:
+                return self.local_buckets.get(key)
+
+    def store_bucket(self, key, bucket):
+        try:
+            self.cache.set(key, bucket, self.duration)
+        except Exception:
+            with self.local_lock:
+                self.local_buckets[key] = bucket
+                self.local_buckets.move_to_end(key)
+                if len(self.local_buckets) > self.max_local_buckets:
+                    self.local_buckets.popitem(last=False)
+
+
+def scoped_throttle(scope):
+    """Return a TokenBucketThrottle bound to ``scope``, for ``@api_view`` functions."""
+    return type(f"{scope.title().replace('_', '')}Throttle", (TokenBucketThrottle,), {'scope': scope})
@@ -4,15 +4,16 @@ from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 from .views import (
     CustomerViewSet, ServiceProviderViewSet,
-    ServiceCategoryViewSet, ServiceViewSet,
+    ServiceCategoryViewSet, ServiceViewSet, ServiceListingViewSet,
     BookingViewSet, AvailabilityViewSet,
     RegisterCustomerView, RegisterProviderView,
-    available_slots, recommend_providers,
+    available_slots, recommend_providers, provider_calendar, heatmap,
     initiate_payment, paystack_webhook
 )
 
 from .view_templates import (
-    register_customer_view, register_provider_view, book_service_view,home_view, ServiceListView, ServiceDetailView,booking_create
+    register_customer_view, register_provider_view, book_service_view,home_view, ServiceListView, ServiceDetailView,booking_create,
+    profile_list, profile_download, profile_toggle
 )
 
 # DRF router
@@ -21,6 +22,7 @@ router.register(r'customers', CustomerViewSet)
 router.register(r'providers', ServiceProviderViewSet)
 router.register(r'categories', ServiceCategoryViewSet)
 router.register(r'services', ServiceViewSet)
+router.register(r'listings', ServiceListingViewSet)
 router.register(r'bookings', BookingViewSet)
 router.register(r'availability', AvailabilityViewSet)
 
@@ -34,6 +36,9 @@ urlpatterns = [
     path('services/', ServiceListView.as_view(), name='service_list'),
     path('services/<int:pk>/', ServiceDetailView.as_view(), name='service_detail'),
     path('book/<int:service_id>/', booking_create, name='booking_create'),
+    path('profiling/', profile_list, name='profile_list'),
+    path('profiling/toggle/', profile_toggle, name='profile_toggle'),
+    path('profiling/<str:name>.<str:kind>', profile_download, name='profile_download'),
 
     # API routes
     path('api/', include(router.urls)),
@@ -42,6 +47,8 @@ urlpatterns = [
     path('api/register/customer/', RegisterCustomerView.as_view(), name='register_customer_api'),
     path('api/register/provider/', RegisterProviderView.as_view(), name='register_provider_api'),
     path('api/available-slots/<int:provider_id>/', available_slots),
+    path('api/provider/calendar/', provider_calendar, name='provider_calendar'),
+    path('api/heatmap/', heatmap, name='heatmap'),
     path('recommend/providers/', recommend_providers),
     path("pay/booking/<int:booking_id>/", initiate_payment),
     path("paystack/callback/", paystack_webhook),
@@ -1,22 +1,25 @@
 from datetime import datetime
-from statistics import mean
-from geopy.distance import geodesic
 from django.shortcuts import render, get_object_or_404, redirect
 from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied
 from django.views import View
 from django.views.generic import ListView, DetailView, CreateView
 from django.urls import reverse_lazy
-from django.http import JsonResponse
-import requests
+from django.views.decorators.cache import cache_page
+from django.views.decorators.http import require_POST
+from django.http import FileResponse, Http404, JsonResponse
 from django.shortcuts import render, redirect
 from .forms import CustomerForm, ServiceProviderForm, BookingForm
 
 from .models import (
     Customer, ServiceProvider, ServiceCategory, Service,
-    Booking, Availability
+    Booking, Availability, ServiceListing
 )
 from .forms import BookingForm, AvailabilityForm
+from . import profiling
+from .sharding import gather, shard_for_provider
 
 
 # ---------------------------
@@ -24,32 +27,37 @@ from .forms import BookingForm, AvailabilityForm
 # ---------------------------
 
 class ServiceListView(ListView):
-    model = Service
+    queryset = ServiceListing.objects.order_by('pk')
     template_name = "services/service_list.html"
     context_object_name = "services"
+    paginate_by = 20
 
 
 class ServiceDetailView(DetailView):
-    model = Service
+    queryset = Service.objects.select_related('provider__user', 'category')
     template_name = "services/service_detail.html"
     context_object_name = "service"
 
 
 @login_required
 def availability_list(request):
-    provider = ServiceProvider.objects.filter(user=request.user).first()
-    availabilities = Availability.objects.filter(provider=provider)
+    if request.provider:
+        availabilities = Availability.objects.using(shard_for_provider(request.provider.pk)) \
+            .filter(provider=request.provider)
+    else:
+        availabilities = Availability.objects.none()
     return render(request, "availability/list.html", {"availabilities": availabilities})
 
 
 @login_required
 def availability_create(request):
-    provider = ServiceProvider.objects.get(user=request.user)
+    if not request.provider:
+        raise PermissionDenied("Provider profile not found.")
     if request.method == "POST":
         form = AvailabilityForm(request.POST)
         if form.is_valid():
             availability = form.save(commit=False)
-            availability.provider = provider
+            availability.provider = request.provider
             availability.save()
             return redirect("availability_list")
     else:
@@ -59,19 +67,23 @@ def availability_create(request):
 
 @login_required
 def booking_list(request):
-    customer = Customer.objects.filter(user=request.user).first()
-    bookings = Booking.objects.filter(customer=customer)
+    if request.customer:
+        bookings = gather(Booking.objects.filter(customer=request.customer).order_by('pk'))
+    else:
+        bookings = Booking.objects.none()
     return render(request, "bookings/list.html", {"bookings": bookings})
 
 
 @login_required
 def booking_create(request, service_id):
     service = get_object_or_404(Service, pk=service_id)
+    if not request.customer:
+        raise PermissionDenied("Customer profile not found.")
     if request.method == "POST":
         form = BookingForm(request.POST)
         if form.is_valid():
             booking = form.save(commit=False)
-            booking.customer = Customer.objects.get(user=request.user)
+            booking.customer = request.customer
             booking.service = service
             booking.save()
             return redirect("booking_list")
@@ -95,34 +107,38 @@ def recommend_providers_template(request):
     user_location = (float(lat), float(lng))
     date = datetime.strptime(date_str, "%Y-%m-%d").date()
 
-    services = Service.objects.filter(category_id=category_id, is_available=True)
-    if not services.exists():
+    from statistics import mean
+    from geopy.distance import geodesic
+
+    listings = list(ServiceListing.objects.filter(category_id=category_id, is_available=True))
+    if not listings:
         return render(request, "recommendations/error.html", {"error": "No services found for this category"})
 
-    avg_price = mean([float(s.price) for s in services])
+    avg_price = mean([float(l.price) for l in listings])
+    providers_with_slot = set(gather(Availability.objects.filter(
+        provider_id__in={l.provider_id for l in listings}, date=date
+    ).values_list('provider_id', flat=True), key=None))
+    providers = ServiceProvider.objects.select_related('user').in_bulk(providers_with_slot)
     recommendations = []
 
-    for service in services:
-        provider = service.provider
-        if not provider.latitude or not provider.longitude:
+    for listing in listings:
+        if not listing.latitude or not listing.longitude:
             continue
-
-        distance_km = geodesic(user_location, (provider.latitude, provider.longitude)).km
-        has_slot = Availability.objects.filter(provider=provider, date=date).exists()
-        if not has_slot:
+        if listing.provider_id not in providers_with_slot:
             continue
 
-        price_factor = float(service.price) / avg_price if avg_price else 1.0
+        distance_km = geodesic(user_location, (listing.latitude, listing.longitude)).km
+        price_factor = float(listing.price) / avg_price if avg_price else 1.0
         score = (
-            -provider.rating * 2 +
+            -listing.provider_rating * 2 +
             distance_km * 1.5 +
             price_factor * 2
         )
 
         recommendations.append({
-            "provider": provider,
-            "service": service,
-            "price": float(service.price),
+            "provider": providers[listing.provider_id],
+            "service": listing,
+            "price": float(listing.price),
             "distance_km": round(distance_km, 2),
             "score": round(score, 2)
         })
@@ -161,6 +177,34 @@ def book_service_view(request):
         form = BookingForm()
     return render(request, 'core/book_service.html', {'form': form})
     
+@cache_page(60 * 15)
 def home_view(request):
     return render(request, "core/home.html")
-    
\ No newline at end of file
+
+
+# ---------------------------
+# Profiling (staff only)
+# ---------------------------
+
+@staff_member_required
+def profile_list(request):
+    return render(request, "profiling/list.html", {
+        "profiles": profiling.list_profiles(),
+        "session_enabled": request.session.get(profiling.SESSION_KEY, False),
+    })
+
+
+@staff_member_required
+def profile_download(request, name, kind):
+    path = profiling.profile_path(name, "." + kind)
+    if path is None:
+        raise Http404("Profile not found")
+    return FileResponse(path.open("rb"), as_attachment=True, filename=path.name)
+
+
+@staff_member_required
+@require_POST
+def profile_toggle(request):
+    request.session[profiling.SESSION_KEY] = not request.session.get(profiling.SESSION_KEY, False)
+    return redirect("profile_list")
+
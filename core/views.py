@@ -1,24 +1,47 @@
-from datetime import datetime
-from statistics import mean
+import heapq
+from datetime import datetime, timedelta
+from operator import itemgetter
 
-import requests
-from geopy.distance import geodesic
 from django.conf import settings
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+from django.http import Http404
 from rest_framework import viewsets, generics, serializers
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 
 from .models import (
     User, Customer, ServiceProvider, ServiceCategory,
-    Service, Booking, Availability
+    Service, Booking, Availability, ServiceListing,
+    ArchivedBooking, ArchivedAvailability
 )
 from .serializers import (
     CustomerSerializer, ServiceProviderSerializer, ServiceCategorySerializer,
     ServiceSerializer, BookingSerializer, RegisterCustomerSerializer,
-    RegisterProviderSerializer, AvailabilitySerializer
+    RegisterProviderSerializer, AvailabilitySerializer, ServiceListingSerializer,
+    ArchivedBookingSerializer, ArchivedAvailabilitySerializer
 )
 from .permissions import IsServiceProvider, IsCustomer
+from .archive import wants_archived
+from .heatmap import FIELDS as HEATMAP_FIELDS, cells_in_bbox, get_config as heatmap_config
+from .fastrender import FastJSONRenderer, FastListMixin, FastRows, compile_serializer
+from .lifecycle import RELEASED_STATUSES
+from .throttling import TokenBucketThrottle, scoped_throttle
+from .recommendations import recommendation_cache
+from .sharding import gather, locate, shard_for_provider
+from .tasks import mark_booking_paid
+
+
+def merge_archived(live, archived):
+    """Merge live and archived rows, both ordered by id, into one id-ordered list."""
+    rows = list(heapq.merge(archived, live, key=itemgetter('id')))
+    if isinstance(live, FastRows) and isinstance(archived, FastRows):
+        return FastRows(rows)
+    return rows
 
 
 # ---------------------------
@@ -30,12 +53,23 @@ class AvailabilityViewSet(viewsets.ModelViewSet):
     permission_classes = [IsServiceProvider]
 
     def perform_create(self, serializer):
-        provider = ServiceProvider.objects.get(user=self.request.user)
-        serializer.save(provider=provider)
+        if not self.request.provider:
+            raise PermissionDenied("Provider profile not found.")
+        serializer.save(provider=self.request.provider)
 
     def get_queryset(self):
-        provider = ServiceProvider.objects.filter(user=self.request.user).first()
-        return Availability.objects.filter(provider=provider)
+        if not self.request.provider:
+            return Availability.objects.none()
+        return Availability.objects.using(shard_for_provider(self.request.provider.pk)) \
+            .filter(provider=self.request.provider).order_by('pk')
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if wants_archived(request) and request.provider:
+            archived = ArchivedAvailability.objects.using(shard_for_provider(request.provider.pk)) \
+                .filter(provider=request.provider).order_by('pk')
+            response.data = merge_archived(response.data, ArchivedAvailabilitySerializer(archived, many=True).data)
+        return response
 
 
 # ---------------------------
@@ -44,12 +78,16 @@ class AvailabilityViewSet(viewsets.ModelViewSet):
 class RegisterCustomerView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = [AllowAny]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'register'
     serializer_class = RegisterCustomerSerializer
 
 
 class RegisterProviderView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = [AllowAny]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'register'
     serializer_class = RegisterProviderSerializer
 
 
@@ -71,9 +109,23 @@ class ServiceCategoryViewSet(viewsets.ModelViewSet):
     serializer_class = ServiceCategorySerializer
 
 
-class ServiceViewSet(viewsets.ModelViewSet):
-    queryset = Service.objects.all()
+class ServiceViewSet(FastListMixin, viewsets.ModelViewSet):
+    queryset = Service.objects.order_by('pk')
     serializer_class = ServiceSerializer
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+
+class ServiceListingViewSet(FastListMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = ServiceListing.objects.order_by('pk')
+    serializer_class = ServiceListingSerializer
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def get_queryset(self):
+        queryset = ServiceListing.objects.filter(is_available=True).order_by('pk')
+        category_id = self.request.GET.get('category_id')
+        if category_id:
+            queryset = queryset.filter(category_id=category_id)
+        return queryset
 
 
 # ---------------------------
@@ -83,27 +135,60 @@ class BookingViewSet(viewsets.ModelViewSet):
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
     permission_classes = [IsCustomer]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
 
     def perform_create(self, serializer):
-        customer = Customer.objects.get(user=self.request.user)
+        if not self.request.customer:
+            raise PermissionDenied("Customer profile not found.")
         scheduled_time = serializer.validated_data['scheduled_time']
         service = serializer.validated_data['service']
 
-        exists = Booking.objects.filter(
-            service__provider=service.provider,
+        exists = Booking.objects.using(shard_for_provider(service.provider_id)).filter(
+            provider_id=service.provider_id,
             scheduled_time=scheduled_time
-        ).exists()
+        ).exclude(status__in=RELEASED_STATUSES).exists()
 
         if exists:
             raise serializers.ValidationError("This time slot is already booked.")
 
-        serializer.save(customer=customer)
+        serializer.save(customer=self.request.customer)
 
     def get_queryset(self):
         if self.request.user.is_staff:
-            return Booking.objects.all()
-        customer = Customer.objects.filter(user=self.request.user).first()
-        return Booking.objects.filter(customer=customer)
+            return Booking.objects.order_by('pk')
+        if not self.request.customer:
+            return Booking.objects.none()
+        return Booking.objects.filter(customer=self.request.customer).order_by('pk')
+
+    def get_archived_queryset(self):
+        if self.request.user.is_staff:
+            return ArchivedBooking.objects.order_by('pk')
+        if not self.request.customer:
+            return ArchivedBooking.objects.none()
+        return ArchivedBooking.objects.filter(customer=self.request.customer).order_by('pk')
+
+    def get_object(self):
+        # Bookings live in their provider's region shard; find the id there.
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        booking = locate(self.filter_queryset(self.get_queryset()), self.kwargs[lookup_url_kwarg])
+        if booking is None:
+            raise Http404
+        self.check_object_permissions(self.request, booking)
+        return booking
+
+    def gather_rows(self, serializer_class, queryset):
+        """Serialize ``queryset`` on every shard, merged by id."""
+        compiled = compile_serializer(serializer_class)
+        if compiled is not None:
+            return FastRows(gather(queryset, compiled.convert_queryset, key=itemgetter('id')))
+        context = self.get_serializer_context()
+        return gather(queryset, lambda qs: serializer_class(qs, many=True, context=context).data, key=itemgetter('id'))
+
+    def list(self, request, *args, **kwargs):
+        rows = self.gather_rows(self.get_serializer_class(), self.filter_queryset(self.get_queryset()))
+        if wants_archived(request):
+            rows = merge_archived(rows, self.gather_rows(ArchivedBookingSerializer, self.get_archived_queryset()))
+        return Response(rows)
 
 
 # ---------------------------
@@ -111,18 +196,20 @@ class BookingViewSet(viewsets.ModelViewSet):
 # ---------------------------
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([scoped_throttle('available_slots')])
 def available_slots(request, provider_id):
     date_str = request.GET.get('date')  # expected format: YYYY-MM-DD
     if not date_str:
         return Response({"error": "date query param is required"}, status=400)
 
     date = datetime.strptime(date_str, "%Y-%m-%d").date()
-    availabilities = Availability.objects.filter(provider__id=provider_id, date=date)
+    shard = shard_for_provider(provider_id)
+    availabilities = Availability.objects.using(shard).filter(provider__id=provider_id, date=date)
 
-    booked_times = Booking.objects.filter(
-        service__provider__id=provider_id,
-        scheduled_time__date=date
-    ).values_list('scheduled_time__time', flat=True)
+    booked_times = Booking.objects.using(shard).filter(
+        provider_id=provider_id,
+        scheduled_date=date
+    ).exclude(status__in=RELEASED_STATUSES).values_list('scheduled_time__time', flat=True)
 
     filtered = [a for a in availabilities if a.start_time not in booked_times]
 
@@ -130,12 +217,113 @@ def available_slots(request, provider_id):
     return Response(serializer.data)
 
 
+@api_view(['GET'])
+@permission_classes([IsServiceProvider])
+def provider_calendar(request):
+    """
+    Booking occupancy for the requesting provider, bucketed by day or week.
+
+    Query params: ``start`` and ``end`` (YYYY-MM-DD, inclusive, default the
+    current week), ``bucket`` (``day`` or ``week``, default ``day``) and
+    ``include_archived`` to also count bookings moved to the archive.
+    """
+    if not request.provider:
+        return Response({"error": "Provider profile not found."}, status=404)
+
+    bucket = request.GET.get('bucket', 'day')
+    if bucket not in ('day', 'week'):
+        return Response({"error": "bucket must be 'day' or 'week'"}, status=400)
+
+    try:
+        if 'start' in request.GET:
+            start = datetime.strptime(request.GET['start'], "%Y-%m-%d").date()
+        else:
+            today = timezone.localdate()
+            start = today - timedelta(days=today.weekday())
+        if 'end' in request.GET:
+            end = datetime.strptime(request.GET['end'], "%Y-%m-%d").date()
+        else:
+            end = start + timedelta(days=6)
+    except ValueError:
+        return Response({"error": "start and end must be YYYY-MM-DD"}, status=400)
+
+    buckets = calendar_buckets(Booking, request.provider, start, end, bucket)
+    if wants_archived(request):
+        by_period = {row['period']: row for row in buckets}
+        for row in calendar_buckets(ArchivedBooking, request.provider, start, end, bucket):
+            if row['period'] in by_period:
+                total = by_period[row['period']]
+                for key, count in row.items():
+                    if key != 'period':
+                        total[key] += count
+            else:
+                by_period[row['period']] = row
+        buckets = sorted(by_period.values(), key=itemgetter('period'))
+    return Response({
+        "start": start,
+        "end": end,
+        "bucket": bucket,
+        "buckets": buckets,
+    })
+
+
+def calendar_buckets(model, provider, start, end, bucket):
+    period = TruncWeek('scheduled_date') if bucket == 'week' else F('scheduled_date')
+    return list(
+        model.objects.using(shard_for_provider(provider.pk))
+        .filter(provider=provider, scheduled_date__range=(start, end))
+        .annotate(period=period)
+        .values('period')
+        .annotate(
+            total=Count('id'),
+            pending=Count('id', filter=Q(status='pending')),
+            confirmed=Count('id', filter=Q(status='confirmed')),
+            completed=Count('id', filter=Q(status='completed')),
+            cancelled=Count('id', filter=Q(status='cancelled')),
+            expired=Count('id', filter=Q(status='expired')),
+        )
+        .order_by('period')
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def heatmap(request):
+    """
+    Precomputed supply/demand cells (see core.heatmap) for a map viewport.
+
+    Query params: ``category``, ``date`` (YYYY-MM-DD), ``bbox``
+    (``min_lng,min_lat,max_lng,max_lat``) and ``precision`` (geohash length).
+    Each cell is an array in the order given by ``fields``.
+    """
+    config = heatmap_config()
+    try:
+        category_id = int(request.GET['category'])
+        date = datetime.strptime(request.GET['date'], "%Y-%m-%d").date()
+        bbox = [float(value) for value in request.GET['bbox'].split(',')]
+        precision = int(request.GET.get('precision', config['DEFAULT_PRECISION']))
+    except (KeyError, ValueError):
+        return Response({"error": "category, date (YYYY-MM-DD) and bbox (min_lng,min_lat,max_lng,max_lat) are required"}, status=400)
+    if len(bbox) != 4:
+        return Response({"error": "bbox must be min_lng,min_lat,max_lng,max_lat"}, status=400)
+    if precision not in config['PRECISIONS']:
+        return Response({"error": f"precision must be one of {list(config['PRECISIONS'])}"}, status=400)
+
+    cells = cells_in_bbox(category_id, date, precision, bbox)
+    if cells is None:
+        return Response({"error": "Too many cells; use a smaller bbox or a lower precision."}, status=400)
+    return Response({
+        "precision": precision,
+        "fields": HEATMAP_FIELDS,
+        "cells": cells,
+    })
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def initiate_payment(request, booking_id):
-    try:
-        booking = Booking.objects.get(id=booking_id, customer__user=request.user)
-    except Booking.DoesNotExist:
+    booking = locate(Booking.objects.filter(customer__user=request.user), booking_id)
+    if booking is None:
         return Response({"error": "Booking not found."}, status=404)
 
     if booking.is_paid:
@@ -154,7 +342,9 @@ def initiate_payment(request, booking_id):
         "callback_url": "https://yourdomain.com/api/paystack/callback/"
     }
 
-    response = requests.post("https://api.paystack.co/transaction/initialize", json=data, headers=headers)
+    import httpx  # Only needed here; importing it at module level slows worker boot.
+
+    response = httpx.post(f"{settings.PAYSTACK_BASE_URL}/transaction/initialize", json=data, headers=headers)
     res_data = response.json()
 
     if response.status_code == 200 and res_data['status']:
@@ -172,19 +362,14 @@ def paystack_webhook(request):
     event = payload.get("event")
 
     if event == "charge.success":
-        ref = payload['data']['reference']
-        try:
-            booking = Booking.objects.get(payment_reference=ref)
-            booking.is_paid = True
-            booking.save()
-        except Booking.DoesNotExist:
-            pass
+        mark_booking_paid.enqueue(payload['data']['reference'])
 
     return Response(status=200)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([scoped_throttle('recommend')])
 def recommend_providers(request):
     category_id = request.GET.get("category_id")
     date_str = request.GET.get("date")  # YYYY-MM-DD
@@ -197,38 +382,8 @@ def recommend_providers(request):
     user_location = (float(lat), float(lng))
     date = datetime.strptime(date_str, "%Y-%m-%d").date()
 
-    services = Service.objects.filter(category_id=category_id, is_available=True)
-    if not services.exists():
+    recommendations = recommendation_cache.get_or_build(category_id, date, *user_location)
+    if recommendations is None:
         return Response({"error": "No services found for this category"}, status=404)
 
-    avg_price = mean([float(s.price) for s in services])
-    recommendations = []
-
-    for service in services:
-        provider = service.provider
-        if not provider.latitude or not provider.longitude:
-            continue
-
-        distance_km = geodesic(user_location, (provider.latitude, provider.longitude)).km
-        has_slot = Availability.objects.filter(provider=provider, date=date).exists()
-        if not has_slot:
-            continue
-
-        price_factor = float(service.price) / avg_price if avg_price else 1.0
-        score = (
-            -provider.rating * 2 +
-            distance_km * 1.5 +
-            price_factor * 2
-        )
-
-        recommendations.append({
-            "provider": ServiceProviderSerializer(provider).data,
-            "service_id": service.id,
-            "service_title": service.title,
-            "price": float(service.price),
-            "distance_km": round(distance_km, 2),
-            "score": round(score, 2)
-        })
-
-    recommendations.sort(key=lambda x: x["score"])
     return Response(recommendations)
\ No newline at end of file
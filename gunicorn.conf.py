@@ -0,0 +1,16 @@
+# Gunicorn settings, picked up automatically from the working directory.
+# https://docs.gunicorn.org/en/stable/settings.html
+
+import multiprocessing
+import os
+
+wsgi_app = 'cleanbase.wsgi:application'
+
+# Static files are returned by WhiteNoise as file wrappers; let gunicorn send
+# them with sendfile() instead of copying them through the worker.
+sendfile = True
+
+# Import the application once in the master and fork workers from it: boot cost
+# is paid once and workers share the imported code pages copy-on-write.
+preload_app = True
+workers = int(os.environ.get('WEB_CONCURRENCY', 2 * multiprocessing.cpu_count() + 1))